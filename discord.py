@@ -1,23 +1,147 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import asyncio
 import re
 import os
-from datetime import datetime, timedelta
-from collections import defaultdict
+import json
+import csv
+import io
+import time
+import contextvars
+import functools
+import sys
+import threading
+import tracemalloc
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from collections import Counter, OrderedDict, deque
+import aiohttp
+from aiohttp import web
 
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
+LOG_CHANNEL_ID = 1381939349855273100  # Channel for debug logs
+
+# Per-guild channels and roles come from this file, one entry per guild ID
+GUILD_CONFIG_PATH = os.getenv("GUILD_CONFIG_PATH", "guilds.json")
+
+# Without a config file the bot serves this one guild
+DEFAULT_GUILD_ID = int(os.getenv("DEFAULT_GUILD_ID", "0"))  # Only used to key its state in the journal
 SOURCE_CHANNEL_IDS = {1370376699442630749, 1381785444018028544}  # Set of allowed source channels
 TARGET_CHANNEL_ID = 1381601141959295082  # Channel where the bot posts the report
 COMMAND_RESPONSE_CHANNEL_ID = 1370376699442630749  # Channel for command responses
-LOG_CHANNEL_ID = 1381939349855273100  # Channel for debug logs
 PING_ROLE_ID = 1370329783703175168  # Role to ping in the main report
 SJW_ROLE_ID = 1370390270138384425  # Role to ping if Monarch/SJW is spotted
 
-# Store the latest message ID for editing
-latest_message_id = None
-latest_message_timestamp = None  # Store the timestamp of the last report
-reported_bosses = defaultdict(lambda: {"reports": {}, "current_boss": None})  # Stores reports per floor
+# Gateway
+LOW_MEMORY = os.getenv("LOW_MEMORY", "1") != "0"  # Only the intents the bot uses and no message or member cache, "0" for the library defaults
+
+# Discord log channel pipeline
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LOG_CHANNEL_LEVEL = os.getenv("LOG_CHANNEL_LEVEL", "info")  # Lines below this level stay on stdout
+LOG_FLUSH_INTERVAL = 5  # Seconds between log flushes
+LOG_QUEUE_LIMIT = 500  # Max lines waiting to be sent, extra lines are dropped and counted
+LOG_BLOCK_LIMIT = 2000  # Discord message limit, one code block per message
+LOG_BLOCKS_PER_FLUSH = 3  # Max log messages sent per flush
+
+# Hourly report cycle
+REPORT_POST_MINUTE = 44  # New report is posted at xx:44
+REPORT_EDIT_END_MINUTE = 55  # Report keeps being edited through xx:55
+REPORT_EDIT_DEBOUNCE = 0.5  # Seconds a change waits for more changes before the report is edited, bursts share one edit
+REPORT_RETRY_INTERVAL = 5  # Seconds the report scheduler backs off after an error
+REPORT_EDIT_CONCURRENCY = 5  # Bulk edits in flight per channel, the size of Discord's message edit bucket
+REPORT_TIMEZONE = os.getenv("REPORT_TIMEZONE", "")  # IANA zone like "Europe/Berlin", empty means fixed UTC+2
+
+# State journal
+STATE_JOURNAL_PATH = os.getenv("STATE_JOURNAL_PATH", "castle_state.jsonl")
+JOURNAL_COMPACT_LINES = 5000  # Rewrite the journal as a snapshot once it has this many events
+
+# Spawn analytics
+SPAWN_STORE_PATH = os.getenv("SPAWN_STORE_PATH", "spawns.csv")  # One row per floor of every finished round, append only
+SPAWN_STATS_PATH = os.getenv("SPAWN_STATS_PATH", "spawn_stats.json")  # Aggregates over the store, rebuilt from it when missing
+SPAWN_EXPORT_CHUNK = 64 * 1024  # Bytes per write when /spawns.csv streams the store
+
+# History backfill
+BACKFILL_WINDOW = timedelta(minutes=10)  # How far back a scan reads source channels
+BACKFILL_MAX_MESSAGES = 2000  # Per channel and scan, the library pages through these 100 at a time
+
+# Boss and floor catalog
+CATALOG_PATH = os.getenv("CATALOG_PATH", "catalog.json")  # Bosses, aliases, emojis and floors, picked up again by !reload
+CATALOG_WATCH_INTERVAL = 10  # Seconds between checks of the catalog file for changes, 0 turns the watcher off
+
+# Typo-tolerant boss matching
+FUZZY_MIN_LENGTH = 5  # Shorter aliases only match exactly, too many everyday words are one typo from "god" or "sung"
+FUZZY_MIN_CONFIDENCE = 0.8  # Min share of an alias that must be spelt right, 1 - edits / alias length
+FUZZY_CACHE_SIZE = 4096  # Distinct chat words whose fuzzy lookup is kept
+
+# Ingest pipeline
+INGEST_QUEUE_SIZE = 10000  # Messages waiting for a worker, further ones are dropped and recovered by a rescan
+INGEST_BATCH_SIZE = 200  # Max messages a worker applies in one go
+INGEST_WORKERS = 2  # More than one only helps while a worker waits on a Monarch alert
+
+# Outbound scheduler
+OUTBOUND_LANES = ("alert", "report", "reply", "log")  # Highest priority first
+OUTBOUND_LANE_LIMITS = {"alert": None, "report": 50, "reply": 50, "log": 10}  # Max queued per lane, None never sheds
+OUTBOUND_BUCKET_SIZE = 5  # Requests per route (call kind and channel) per period, like Discord's message buckets
+OUTBOUND_BUCKET_PERIOD = 5  # Seconds
+OUTBOUND_GLOBAL_LIMIT = 50  # Requests per second across all routes, Discord's global limit
+OUTBOUND_WAIT_BUCKETS = (0.01, 0.1, 0.5, 1, 2, 5, 10, 30)  # Seconds a request waits in its lane
+
+# Profiling
+PROFILE_ON_START = os.getenv("PROFILE_ON_START", "") == "1"  # Profile from startup until !profile stop
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "profiles")  # Summaries are written here, one file per session
+PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples of the event loop thread
+PROFILE_LAG_INTERVAL = 0.1  # Seconds between event loop lag probes
+PROFILE_TOP_N = 25  # Rows per table in the summary
+PROFILE_SECTION_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)  # Seconds per handler call
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)  # Seconds a lag probe woke late
+
+# Metrics
+METRICS_HOST = "127.0.0.1"  # Metrics endpoint only listens locally
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # 0 turns the /metrics endpoint off
+PROPAGATION_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)  # Seconds from a report message to the edit showing it
+API_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)  # Seconds per outbound Discord call
+
+def load_report_timezone(name):
+    """Returns the report time zone, a fixed UTC+2 offset unless an IANA zone name is configured."""
+    if name:
+        return ZoneInfo(name)
+    return timezone(timedelta(hours=2))
+
+class SystemClock:
+    """Wall clock in the report time zone. Simulations swap in a virtual clock with the same methods."""
+
+    def __init__(self, tz):
+        self.tz = tz
+
+    def now(self):
+        return datetime.now(self.tz)
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    async def sleep_until(self, moment):
+        # Via timestamps so a DST change between now and then is accounted for
+        await asyncio.sleep(max(0.0, moment.timestamp() - self.now().timestamp()))
+
+    async def wait(self, event, timeout):
+        """Waits for an asyncio.Event, returns False if timeout seconds pass first."""
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+clock = SystemClock(load_report_timezone(REPORT_TIMEZONE))
+
+# Report consensus
+OVERRIDE_VOTES = 3  # Distinct voters needed to replace the first reported boss
+VOTE_WINDOW = timedelta(minutes=15)  # Votes older than this stop counting
+ROUND_HISTORY_SIZE = 48  # Hourly rounds kept in memory for !history
+HISTORY_DEFAULT_ROUNDS = 5  # Rounds shown by a bare !history
+HISTORY_MAX_ROUNDS = 12  # Most rounds !history shows, to stay within one message
+
+# Built-in catalog, used when there is no catalog file. Edit the file instead, it reloads without a restart
 
 # Allowed floor numbers
 VALID_FLOORS = {"30", "35", "40", "45", "55", "60", "65", "70"}
@@ -61,155 +185,1496 @@ BOSS_EMOJIS = {
 
 }
 
-intents = discord.Intents.default()
-intents.message_content = True  # Enable message content intent
-intents.guilds = True  # Enable guild intent for accessing guild information
-
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+class FloorTally:
+    """Vote tally for one floor: the first report wins until another boss gets OVERRIDE_VOTES distinct voters.
+
+    Reports are kept in posting order, so a late or withdrawn one can be counted the way a fresh scan would count
+    it. Most of those are applied in place; the tally is only recounted when one could change the first report or
+    the override that made the current boss current."""
+
+    __slots__ = ("floor", "message_index", "seen_messages", "reports", "voter_reports", "backing", "backers",
+                 "latest_report", "base_boss", "votes", "counts", "arrivals", "current_boss", "last_override",
+                 "last_override_votes", "last_expired", "recount_pending")
+
+    def __init__(self, floor=None, message_index=None):
+        self.floor = floor
+        self.message_index = {} if message_index is None else message_index  # Message ID -> (floor, report), shared by a round's tallies
+        self.seen_messages = set()  # Message IDs already counted, so rescans don't count twice
+        self.reports = []  # (timestamp, voter, boss, message ID) of every counted report in posting order
+        self.voter_reports = {}  # Voter ID -> their reports in posting order
+        self.backing = Counter()  # (voter, boss) -> reports the voter made for that boss
+        self.backers = Counter()  # Boss -> distinct voters who reported it, live or not
+        self.latest_report = {}  # Boss -> timestamp of its newest report, never moved back by a retraction
+        self.base_boss = None  # Boss set by a manual override, the count starts over from it
+        self.reset_counts()
+
+    def reset_counts(self):
+        """Forgets what was counted from the reports."""
+        self.votes = {}  # Voter ID -> report of their latest live vote
+        self.counts = {}  # Boss -> number of distinct voters backing it
+        self.arrivals = deque()  # (timestamp, voter ID) in posting order, for expiry
+        self.current_boss = self.base_boss
+        self.last_override = None  # Report that last got its boss to OVERRIDE_VOTES voters, current_boss comes from it
+        self.last_override_votes = None  # Voters it had then, None once a late report may have moved the last override
+        self.last_expired = None  # Timestamp of the newest arrival expired so far
+        self.recount_pending = False  # A deferred recount is owed, the counts don't include every report yet
+
+    def expire(self, now):
+        """Drops votes older than VOTE_WINDOW."""
+        cutoff = now - VOTE_WINDOW
+        while self.arrivals and self.arrivals[0][0] < cutoff:
+            timestamp, voter = self.arrivals.popleft()
+            self.last_expired = timestamp
+            vote = self.votes.get(voter)
+            if vote and vote[0] == timestamp:  # Skip entries the voter has since replaced
+                del self.votes[voter]
+                self._uncount(vote[2])
+
+    def add_vote(self, voter, boss, timestamp, message_id=None, defer_recount=False):
+        """Counts one vote and returns "duplicate", "first", "changed", "confirmed", "pending", "late" or "recounted".
+        With defer_recount, a vote that needs a recount returns "deferred" and the caller settles the tally later."""
+        if message_id is not None:
+            if message_id in self.seen_messages:
+                return "duplicate"
+            self.seen_messages.add(message_id)
+
+        report = (timestamp, voter, boss, message_id)
+        if not self.reports or timestamp >= self.reports[-1][0]:
+            self._index(report, len(self.reports))
+            return self._count(report)
+
+        # Posted before reports already counted (an edit re-cast, or channels delivering slightly out of order)
+        self._index(report, bisect_left(self.reports, (timestamp,)))
+        if self.recount_pending or self._may_change(report, adding=True):
+            if defer_recount:
+                self.recount_pending = True
+                return "deferred"
+            self.rebuild()
+            return "recounted"
+        self._count_late(report)
+        return "late"
+
+    def retract(self, message_id):
+        """Withdraws the report message_id cast, returns True if the current boss changed."""
+        entry = self.message_index.get(message_id)
+        if entry is None or entry[0] != self.floor:
+            return False  # Never counted here, or counted before a manual override
+        report = entry[1]
+        previous_boss = self.current_boss
+        recount = self.recount_pending or self._may_change(report, adding=False)
+        self._unindex(report)
+        self.seen_messages.discard(message_id)  # An edit may count it again with its new content
+        if recount:
+            self.rebuild()
+        else:
+            self._uncount_late(report)
+        return self.current_boss != previous_boss
+
+    def rebuild(self):
+        """Recounts the reports in posting order, as a fresh scan of the surviving messages would."""
+        self.reset_counts()
+        for report in self.reports:
+            self._count(report)
+
+    def settle(self):
+        """Does a deferred recount, if one is owed."""
+        if self.recount_pending:
+            self.rebuild()
+
+    def set_boss(self, boss):
+        """Manual override: makes boss current and forgets the votes so far."""
+        for report in self.reports:
+            self.message_index.pop(report[3], None)
+        self.reports = []
+        self.voter_reports = {}
+        self.backing = Counter()
+        self.backers = Counter()
+        self.latest_report = {}
+        self.base_boss = boss
+        self.reset_counts()
+
+    def to_record(self):
+        """Returns the tally as JSON-friendly data, every counted report in posting order."""
+        reports = [[voter, boss, timestamp.isoformat(), message_id] for timestamp, voter, boss, message_id in self.reports]
+        return {"current_boss": self.current_boss, "base_boss": self.base_boss, "reports": reports,
+                "seen_messages": sorted(self.seen_messages)}
+
+    @classmethod
+    def from_record(cls, record, floor=None, message_index=None):
+        """Rebuilds a tally from to_record() output."""
+        tally = cls(floor, message_index)
+        tally.base_boss = record.get("base_boss")
+        if "reports" in record:
+            reports = [(datetime.fromisoformat(timestamp), voter, boss, message_id)
+                       for voter, boss, timestamp, message_id in record["reports"]]
+        else:
+            # Snapshots before retraction support only hold the live votes, with or without their message ID
+            reports = [(datetime.fromisoformat(timestamp), voter, boss, message_id[0] if message_id else None)
+                       for voter, boss, timestamp, *message_id in record["votes"]]
+        for report in reports:
+            tally._index(report, len(tally.reports))
+        tally.seen_messages = set(record["seen_messages"])
+        tally.rebuild()
+        tally.current_boss = record["current_boss"]
+        return tally
+
+    def _index(self, report, position):
+        timestamp, voter, boss, message_id = report
+        self.reports.insert(position, report)
+        history = self.voter_reports.setdefault(voter, [])
+        if not history or timestamp >= history[-1][0]:
+            history.append(report)
+        else:
+            history.insert(bisect_left(history, (timestamp,)), report)  # Same place among ties as in reports
+        self.backing[voter, boss] += 1
+        if self.backing[voter, boss] == 1:
+            self.backers[boss] += 1
+        if boss not in self.latest_report or timestamp > self.latest_report[boss]:
+            self.latest_report[boss] = timestamp
+        if message_id is not None:
+            self.message_index[message_id] = (self.floor, report)
+
+    def _unindex(self, report):
+        timestamp, voter, boss, message_id = report
+        del self.reports[self._position(self.reports, report)]
+        history = self.voter_reports[voter]
+        del history[self._position(history, report)]
+        if not history:
+            del self.voter_reports[voter]
+        self.backing[voter, boss] -= 1
+        if not self.backing[voter, boss]:
+            del self.backing[voter, boss]
+            self.backers[boss] -= 1
+        if message_id is not None:
+            self.message_index.pop(message_id, None)
+
+    @staticmethod
+    def _position(reports, report):
+        position = bisect_left(reports, (report[0],))
+        while reports[position] is not report:
+            position += 1
+        return position
+
+    def _count(self, report):
+        """Counts a report posted after every other one, returns the add_vote() outcome."""
+        timestamp, voter, boss, _ = report
+        self.expire(timestamp)
+
+        # A voter only ever backs one boss, their latest vote replaces the previous one
+        previous = self.votes.get(voter)
+        self.votes[voter] = report
+        self.arrivals.append((timestamp, voter))
+        if previous is None or previous[2] != boss:
+            if previous is not None:
+                self._uncount(previous[2])
+            self.counts[boss] = self.counts.get(boss, 0) + 1
+
+        if self.current_boss is None:
+            self.current_boss = boss
+            return "first"
+        if self.counts[boss] >= OVERRIDE_VOTES:
+            self.last_override = report
+            self.last_override_votes = self.counts[boss]
+            if self.current_boss != boss:
+                self.current_boss = boss
+                return "changed"
+            return "confirmed"
+        return "pending"
+
+    def _may_change(self, report, adding):
+        """Tells whether adding or withdrawing a report that isn't the newest could change the current boss. The
+        current boss comes from the first report or from the last override, so only those two need checking."""
+        timestamp, voter, boss, _ = report
+        if self.reports[0] is report and self.base_boss is None:
+            return True  # It is, or was, the first report
+        if not adding and self.reports[-1] is report:
+            # Withdrawing the newest report moves expiry back, votes already expired may count again
+            if len(self.reports) == 1 or (self.last_expired is not None
+                                          and self.last_expired >= self.reports[-2][0] - VOTE_WINDOW):
+                return True
+
+        # Between this report and the voter's next one, the voter backs boss instead of what they backed before
+        history = self.voter_reports[voter]
+        position = self._position(history, report)
+        later = history[position + 1] if position + 1 < len(history) else None
+        earlier = history[position - 1][2] if position and history[position - 1][0] >= timestamp - VOTE_WINDOW else None
+        if earlier == boss:
+            earlier = None  # Same boss, only how long the voter backs it changes
+        gained, lost = (boss, earlier) if adding else (earlier, boss)
+
+        if gained is not None and self.backers[gained] >= OVERRIDE_VOTES:
+            if gained != self.current_boss:
+                if self.last_override is None or self.latest_report[gained] >= self.last_override[0]:
+                    return True  # Another boss may reach OVERRIDE_VOTES after the last override
+            elif self.last_override is None:
+                return True  # The current boss may get an override that isn't tracked
+            else:
+                self.last_override_votes = None  # The current boss may get later overrides, the last one is unknown now
+
+        if lost is not None and lost == self.current_boss and self.last_override is not None:
+            override = self.last_override
+            if override is report:
+                return True
+            reaches = later is None or later[0] >= override[0]
+            if self.last_override_votes is None:
+                if reaches:
+                    return True  # The last override may fall in the stretch where this voter's backing changed
+            elif reaches and timestamp <= override[0]:
+                if self.last_override_votes <= OVERRIDE_VOTES:
+                    return True  # The last override loses a voter it needed
+                self.last_override_votes -= 1
+        return False
+
+    def _count_late(self, report):
+        """Counts a report posted before the newest one, once _may_change() ruled out a new current boss."""
+        timestamp, voter, boss, _ = report
+        if timestamp < self.reports[-1][0] - VOTE_WINDOW:
+            return  # Already expired by the reports after it
+        position = len(self.arrivals)
+        while position and self.arrivals[position - 1][0] > timestamp:
+            position -= 1
+        self.arrivals.insert(position, (timestamp, voter))  # Even if replaced, a retraction may bring it back
+        vote = self.votes.get(voter)
+        if vote is not None and vote[0] >= timestamp:
+            return  # The voter has reported since, that vote stands
+        self.votes[voter] = report
+        if vote is None or vote[2] != boss:
+            if vote is not None:
+                self._uncount(vote[2])
+            self.counts[boss] = self.counts.get(boss, 0) + 1
+
+    def _uncount_late(self, report):
+        """Withdraws a report's vote, once _may_change() ruled out a new current boss."""
+        voter, boss = report[1], report[2]
+        if self.votes.get(voter) is not report:
+            return  # Replaced by a later report or expired, it doesn't count anymore anyway
+        del self.votes[voter]
+        self._uncount(boss)
+        history = self.voter_reports.get(voter)
+        if history and history[-1][0] >= self.reports[-1][0] - VOTE_WINDOW:
+            # Their previous report counts again, it was the newest of theirs before this one
+            previous = history[-1]
+            self.votes[voter] = previous
+            self.counts[previous[2]] = self.counts.get(previous[2], 0) + 1
+
+    def _uncount(self, boss):
+        count = self.counts[boss] - 1
+        if count:
+            self.counts[boss] = count
+        else:
+            del self.counts[boss]
+
+class CastleRound:
+    """One hourly castle: a tally per floor while it's live, just the per-floor results once sealed."""
+
+    __slots__ = ("hour", "floors", "floor_index", "message_index", "tallies", "results", "notified")
+
+    def __init__(self, hour, floors):
+        self.hour = hour  # UTC hour key
+        self.floors = floors  # Floors in report order
+        self.floor_index = {floor: index for index, floor in enumerate(floors)}
+        self.message_index = {}  # Message ID -> (floor, report) of every report counted, for edits and deletes
+        self.tallies = [FloorTally(floor, self.message_index) for floor in floors]  # Indexed like floors, None once sealed
+        self.results = None  # (boss, voters) per floor once sealed
+        self.notified = set()  # Floors already alerted for Monarch this round
+
+    def tally(self, floor):
+        """Returns the live tally for a floor, or None once the round is sealed or the floor isn't part of it."""
+        if self.tallies is None or floor not in self.floor_index:
+            return None
+        return self.tallies[self.floor_index[floor]]
+
+    def counted_report(self, message_id):
+        """Returns (floor, boss) message_id was counted for, None if it wasn't counted in this round."""
+        entry = self.message_index.get(message_id)
+        if self.tallies is None or entry is None:
+            return None
+        return entry[0], entry[1][2]
+
+    def bosses(self):
+        """Returns (floor, boss or None) for every floor in report order."""
+        if self.tallies is None:
+            return [(floor, boss) for floor, (boss, _) in zip(self.floors, self.results)]
+        return [(floor, tally.current_boss) for floor, tally in zip(self.floors, self.tallies)]
+
+    def reset(self):
+        """Forgets every vote of a live round."""
+        if self.tallies is not None:
+            self.message_index.clear()
+            self.tallies = [FloorTally(floor, self.message_index) for floor in self.floors]
+
+    def standings(self):
+        """Returns (boss or None, voters backing it) per floor in report order."""
+        if self.tallies is None:
+            return self.results
+        return tuple((tally.current_boss, tally.counts.get(tally.current_boss, 0)) for tally in self.tallies)
+
+    def seal(self):
+        """Keeps only each floor's result and frees the per-vote state."""
+        if self.tallies is not None:
+            for tally in self.tallies:
+                tally.settle()
+            self.results = self.standings()
+            self.tallies = None
+            self.message_index.clear()
+
+    def to_record(self):
+        """Returns the round as JSON-friendly data."""
+        record = {"hour": self.hour.isoformat(), "floors": list(self.floors), "notified": sorted(self.notified)}
+        if self.tallies is None:
+            record["results"] = [list(result) for result in self.results]
+        else:
+            record["tallies"] = [tally.to_record() for tally in self.tallies]
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        """Rebuilds a round from to_record() output."""
+        castle_round = cls(datetime.fromisoformat(record["hour"]), tuple(record["floors"]))
+        castle_round.notified = set(record["notified"])
+        if "results" in record:
+            castle_round.results = tuple(tuple(result) for result in record["results"])
+            castle_round.tallies = None
+        else:
+            castle_round.tallies = [FloorTally.from_record(tally, floor, castle_round.message_index)
+                                    for floor, tally in zip(castle_round.floors, record["tallies"])]
+        return castle_round
+
+class RoundBuffer:
+    """Fixed-size ring of the most recent hourly rounds, the newest one is live."""
+
+    __slots__ = ("slots", "head")
+
+    def __init__(self, size):
+        self.slots = [None] * size
+        self.head = 0  # Index of the newest round
+
+    def latest(self):
+        return self.slots[self.head]
+
+    def push(self, castle_round):
+        """Seals the current round and makes castle_round the newest, overwriting the oldest."""
+        if self.slots[self.head] is not None:
+            self.slots[self.head].seal()
+            self.head = (self.head + 1) % len(self.slots)
+        self.slots[self.head] = castle_round
+
+    def restore(self, castle_round):
+        """Puts a round rebuilt from a snapshot in place of the one for its hour, or pushes it if there's none."""
+        for index, existing in enumerate(self.slots):
+            if existing is not None and existing.hour == castle_round.hour:
+                self.slots[index] = castle_round
+                return
+        self.push(castle_round)
+
+    def recent(self, count):
+        """Returns up to count rounds, newest first."""
+        rounds = []
+        for offset in range(min(count, len(self.slots))):
+            castle_round = self.slots[(self.head - offset) % len(self.slots)]
+            if castle_round is None:
+                break
+            rounds.append(castle_round)
+        return rounds
+
+    def find(self, hour):
+        for castle_round in self.recent(len(self.slots)):
+            if castle_round.hour == hour:
+                return castle_round
+        return None
+
+class GuildState:
+    """One server the bot reports for: its channels and roles plus its own rounds, reports and scheduler state."""
+
+    __slots__ = ("guild_id", "name", "source_channel_ids", "target_channel_id", "command_response_channel_id",
+                 "ping_role_id", "sjw_role_id", "rounds", "report_messages", "backfill_watermarks",
+                 "last_report_hour", "report_dirty", "report_changed_at", "report_version", "rendered_floors",
+                 "report_digests")
+
+    def __init__(self, guild_id, config):
+        self.guild_id = guild_id
+        self.name = config.get("name", str(guild_id))  # Prefix for this guild's log lines
+        self.source_channel_ids = frozenset(int(channel_id) for channel_id in config["source_channel_ids"])
+        self.target_channel_id = int(config["target_channel_id"])
+        self.command_response_channel_id = int(config["command_response_channel_id"])
+        self.ping_role_id = int(config["ping_role_id"])
+        self.sjw_role_id = int(config["sjw_role_id"])
+
+        self.rounds = RoundBuffer(ROUND_HISTORY_SIZE)
+        self.report_messages = OrderedDict()  # Hour key -> discord.PartialMessage, oldest first
+        self.backfill_watermarks = {}  # Channel ID -> newest message ID a backfill has already read
+        self.last_report_hour = None  # Hour key of the last hour a report was posted for
+        self.report_dirty = None  # Set when floor data changes so the edit window knows to edit
+        self.report_changed_at = None  # Creation time of the oldest report message not yet shown in an edit
+        self.report_version = 0  # Bumped on every change to the live round's bosses
+        self.rendered_floors = None  # (version, hour, catalog) and the floor lines rendered for them
+        self.report_digests = {}  # Report message ID -> hash of the content last sent to it
+
+DEFAULT_GUILD_CONFIG = {
+    "name": "default",
+    "source_channel_ids": sorted(SOURCE_CHANNEL_IDS),
+    "target_channel_id": TARGET_CHANNEL_ID,
+    "command_response_channel_id": COMMAND_RESPONSE_CHANNEL_ID,
+    "ping_role_id": PING_ROLE_ID,
+    "sjw_role_id": SJW_ROLE_ID,
+}
 
-async def log_to_discord(message):
-    """Send debug/console messages to Discord log channel."""
+guilds = {}  # Guild ID -> GuildState
+channel_guilds = {}  # Source or target channel ID -> GuildState it belongs to, routes every message
+
+def load_guild_configs(path):
+    """Reads guild ID -> config from the JSON config file, or the built-in default guild if there is no file."""
+    if not os.path.exists(path):
+        return {DEFAULT_GUILD_ID: DEFAULT_GUILD_CONFIG}
+    with open(path, encoding="utf-8") as config_file:
+        return {int(guild_id): config for guild_id, config in json.load(config_file).items()}
+
+def configure_guilds(configs):
+    """Sets up a fresh GuildState per configured guild, called at startup before any state exists."""
+    new_guilds = {guild_id: GuildState(guild_id, config) for guild_id, config in configs.items()}
+    new_channels = {}
+    for guild in new_guilds.values():
+        for channel_id in (*guild.source_channel_ids, guild.target_channel_id):
+            owner = new_channels.setdefault(channel_id, guild)
+            if owner is not guild:
+                raise ValueError(f"Channel {channel_id} is configured for guilds {owner.guild_id} and {guild.guild_id}")
+
+    guilds.clear()
+    guilds.update(new_guilds)
+    channel_guilds.clear()
+    channel_guilds.update(new_channels)
+
+configure_guilds(load_guild_configs(GUILD_CONFIG_PATH))
+
+def round_for(guild, hour):
+    """Returns the guild's round for an hour key, starting a new one when that hour is newer than the live round."""
+    latest = guild.rounds.latest()
+    if latest is None or hour > latest.hour:
+        guild.rounds.push(CastleRound(hour, catalog.floor_order))  # A live round keeps its floors across reloads
+        return guild.rounds.latest()
+    if hour == latest.hour:
+        return latest
+    return guild.rounds.find(hour)  # Older round, sealed or already overwritten
+
+def current_round(guild):
+    """Returns the guild's live round for the current hour."""
+    return round_for(guild, report_hour_key(clock.now()))
+
+def vote_tally(guild, floor, timestamp):
+    """Returns the tally a vote posted at timestamp counts towards, None if its round is closed."""
+    castle_round = round_for(guild, report_hour_key(timestamp.astimezone(clock.tz)))
+    if castle_round is None:
+        return None
+    return castle_round.tally(floor)
+
+def record_vote(guild, floor, boss_name, voter, timestamp, message_id=None, late_tallies=None):
+    """Applies one boss report to its floor's tally, returns True if the floor's boss changed. Given a late_tallies
+    set, tallies a report lands behind others in are added to it for the caller to settle once, instead of per report."""
+    tally = vote_tally(guild, floor, timestamp)
+    if tally is None:
+        return False  # Report for an hour that's already over, or for a floor added after its round started
+    previous_boss = tally.current_boss
+    outcome = tally.add_vote(voter, boss_name, timestamp, message_id, defer_recount=late_tallies is not None)
+    if outcome == "deferred":
+        late_tallies.add(tally)
+    if outcome != "duplicate":
+        journal("vote", guild=guild.guild_id, floor=floor, boss=boss_name, voter=voter,
+                ts=timestamp.isoformat(), message_id=message_id)
+
+    if outcome == "first":
+        enhanced_print(f"[{guild.name}] Floor {floor}: First report for {boss_name}")
+    elif outcome == "changed":
+        enhanced_print(f"[{guild.name}] Floor {floor}: Changed to {boss_name} ({OVERRIDE_VOTES}+ reports: {tally.counts[boss_name]})")
+    elif outcome == "confirmed":
+        enhanced_print(f"[{guild.name}] Floor {floor}: Confirmed {boss_name} (reports: {tally.counts[boss_name]})", level="debug")
+    elif outcome == "pending":
+        enhanced_print(f"[{guild.name}] Floor {floor}: Multiple reports but no boss has {OVERRIDE_VOTES}+ yet: {tally.counts}", level="debug")
+    elif outcome == "late":
+        enhanced_print(f"[{guild.name}] Floor {floor}: Counted a late {boss_name} report in place, still {tally.current_boss}", level="debug")
+    elif outcome == "recounted":
+        enhanced_print(f"[{guild.name}] Floor {floor}: Recounted with an earlier {boss_name} report, now {tally.current_boss}", level="debug")
+
+    if tally.current_boss == previous_boss:
+        return False
+    guild.report_version += 1
+    return True
+
+def message_round(guild, message_id):
+    """Returns the live round a message's vote counts in, going by the hour it was posted, None once that's sealed."""
+    posted_at = discord.utils.snowflake_time(message_id).astimezone(clock.tz)
+    castle_round = guild.rounds.find(report_hour_key(posted_at))
+    if castle_round is None or castle_round.tallies is None:
+        return None
+    return castle_round
+
+def retract_vote(guild, castle_round, message_id):
+    """Withdraws the report a message cast in castle_round, returns True if its floor's boss changed."""
+    report = castle_round.counted_report(message_id)
+    if report is None:
+        return False
+    floor, boss_name = report
+    changed = castle_round.tally(floor).retract(message_id)
+    journal("retract", guild=guild.guild_id, hour=castle_round.hour.isoformat(), floor=floor, message_id=message_id)
+    enhanced_print(f"[{guild.name}] Floor {floor}: Withdrew a {boss_name} report (message {message_id})")
+    if changed:
+        guild.report_version += 1
+    return changed
+
+class Histogram:
+    """Fixed-bucket histogram, one bisect and two adds per observation."""
+
+    __slots__ = ("bounds", "buckets", "count", "total")
+
+    def __init__(self, bounds):
+        self.bounds = bounds  # Upper bucket bounds, ascending
+        self.buckets = [0] * (len(bounds) + 1)  # Per bucket counts, the last one is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket holding the q-th observation, None when empty."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+metrics_started = time.monotonic()
+metric_counts = Counter()  # Event name -> count, bumped inline on hot paths
+api_calls = Counter()  # (call site, kind) -> outbound Discord calls made
+api_errors = Counter()  # (call site, HTTP status) -> calls that raised HTTPException
+http_responses = Counter()  # (call site, HTTP status) -> HTTP responses, including 429s the library retried
+api_latency = {}  # Call kind -> Histogram of call durations
+propagation_latency = Histogram(PROPAGATION_BUCKETS)
+metrics_runner = None
+
+# Call site of the outbound request in flight, read by the HTTP trace below
+api_call_site = contextvars.ContextVar("api_call_site", default="other")
+
+async def api_call(site, kind, call):
+    """Awaits one outbound Discord call, counting it, its duration and any HTTP error against its call site."""
+    api_calls[site, kind] += 1
+    token = api_call_site.set(site)
+    start = time.perf_counter()
+    try:
+        return await call
+    except discord.HTTPException as e:
+        api_errors[site, e.status] += 1
+        raise
+    finally:
+        api_call_site.reset(token)
+        histogram = api_latency.get(kind)
+        if histogram is None:
+            histogram = api_latency[kind] = Histogram(API_LATENCY_BUCKETS)
+        histogram.observe(time.perf_counter() - start)
+
+async def count_http_response(session, context, params):
+    http_responses[api_call_site.get(), params.response.status] += 1
+
+http_trace = aiohttp.TraceConfig()
+http_trace.on_request_end.append(count_http_response)
+
+class TokenBucket:
+    """Lets size requests through per period seconds, refilling continuously."""
+
+    __slots__ = ("size", "rate", "tokens", "updated")
+
+    def __init__(self, size, period, now):
+        self.size = size
+        self.rate = size / period  # Tokens per second
+        self.tokens = float(size)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Returns seconds until a token is free, 0 if one is free now."""
+        self.tokens = min(self.size, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+class OutboundDropped(Exception):
+    """The scheduler shed a queued request because its lane was full."""
+
+class OutboundRequest:
+    __slots__ = ("lane", "site", "kind", "route", "call", "key", "future", "queued_at", "context")
+
+    def __init__(self, lane, site, kind, route, call, key, queued_at):
+        self.lane = lane  # Index into OUTBOUND_LANES
+        self.site = site
+        self.kind = kind
+        self.route = route  # (kind, channel ID), one rate limit bucket each
+        self.call = call  # Zero-argument function returning the awaitable to send
+        self.key = key  # Coalescing key, a newer request with the same key replaces this one
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = queued_at
+        self.context = contextvars.copy_context()  # The call runs in its caller's context
+
+outbound_lanes = [deque() for _ in OUTBOUND_LANES]  # Queued OutboundRequests per lane, oldest first
+outbound_pending = {}  # Coalescing key -> queued OutboundRequest
+outbound_buckets = {}  # Route -> TokenBucket
+outbound_global_bucket = None
+outbound_wakeup = None  # Set when a request is queued
+outbound_dispatcher_task = None
+outbound_wait = [Histogram(OUTBOUND_WAIT_BUCKETS) for _ in OUTBOUND_LANES]  # Queue wait per lane
+outbound_coalesced = Counter()  # Lane -> requests merged into a newer one
+outbound_dropped = Counter()  # Lane -> requests shed because the lane was full
+
+async def outbound(lane, site, kind, channel, call, key=None):
+    """Sends one Discord call through the priority scheduler and returns its result.
+
+    lane is one of OUTBOUND_LANES and call a zero-argument function returning the awaitable, so
+    nothing is sent until the scheduler starts it. Requests sharing a key coalesce: the queued one
+    is replaced and both callers get the newer call's result.
+    """
+    if outbound_dispatcher_task is None:
+        return await api_call(site, kind, call())  # Scheduler not running, send directly
+
+    lane_index = OUTBOUND_LANES.index(lane)
+    pending = outbound_pending.get(key) if key is not None else None
+    if pending is not None:
+        pending.call = call  # Only the latest version is worth sending
+        outbound_coalesced[lane] += 1
+        return await asyncio.shield(pending.future)
+
+    queue = outbound_lanes[lane_index]
+    limit = OUTBOUND_LANE_LIMITS[lane]
+    if limit is not None and len(queue) >= limit:
+        shed = queue.popleft()  # Under pressure the oldest queued request of this lane goes
+        if shed.key is not None:
+            outbound_pending.pop(shed.key, None)
+        shed.future.set_exception(OutboundDropped(f"{lane} lane full"))
+        shed.future.exception()  # Mark retrieved, the caller may have stopped waiting
+        outbound_dropped[lane] += 1
+
+    request = OutboundRequest(lane_index, site, kind, (kind, channel.id), call, key, clock.now().timestamp())
+    queue.append(request)
+    if key is not None:
+        outbound_pending[key] = request
+    outbound_wakeup.set()
+    return await asyncio.shield(request.future)
+
+def dispatch_ready():
+    """Starts every queued request whose buckets have a token, highest lane first.
+
+    Returns seconds until the next waiting request could start, None when nothing is queued.
+    """
+    now = clock.now().timestamp()
+    next_start = None
+    for queue in outbound_lanes:
+        for request in list(queue):
+            bucket = outbound_buckets.get(request.route)
+            if bucket is None:
+                bucket = outbound_buckets[request.route] = TokenBucket(OUTBOUND_BUCKET_SIZE, OUTBOUND_BUCKET_PERIOD, now)
+            wait = max(bucket.wait_time(now), outbound_global_bucket.wait_time(now))
+            if wait:
+                next_start = wait if next_start is None else min(next_start, wait)
+                continue
+
+            bucket.take()
+            outbound_global_bucket.take()
+            queue.remove(request)
+            if request.key is not None:
+                outbound_pending.pop(request.key, None)
+            outbound_wait[request.lane].observe(now - request.queued_at)
+            request.context.run(asyncio.create_task, run_outbound(request))
+    return next_start
+
+async def run_outbound(request):
     try:
-        log_channel = bot.get_channel(LOG_CHANNEL_ID)
-        if log_channel:
-            # Truncate message if too long for Discord (2000 char limit)
-            if len(message) > 1900:
-                message = message[:1900] + "..."
-            await log_channel.send(f"```{message}```")
+        result = await api_call(request.site, request.kind, request.call())
     except Exception as e:
-        print(f"Failed to log to Discord: {e}")
-
-def enhanced_print(message):
-    """Print to console and send to Discord log channel."""
-    print(message)
-    if bot.is_ready():
-        asyncio.create_task(log_to_discord(message))
+        request.future.set_exception(e)
+        request.future.exception()  # Mark retrieved, the caller may have stopped waiting
+    else:
+        request.future.set_result(result)
+
+async def outbound_dispatcher():
+    """Starts queued requests as their rate limit buckets allow and sleeps until the next one can go."""
+    while True:
+        outbound_wakeup.clear()
+        next_start = dispatch_ready()
+        if next_start is None:
+            await outbound_wakeup.wait()
+        else:
+            await clock.wait(outbound_wakeup, next_start)
 
-async def scan_recent_messages_for_bosses():
-    """Scans the last 10 minutes of messages from source channels to rebuild boss data."""
-    now = datetime.utcnow() + timedelta(hours=2)
-    cutoff_time = now - timedelta(minutes=10)
+def start_outbound_dispatcher():
+    """Starts the outbound scheduler once, even if on_ready fires again after a reconnect."""
+    global outbound_global_bucket, outbound_wakeup, outbound_dispatcher_task
 
-    enhanced_print("Scanning recent messages to rebuild boss data...")
+    if outbound_dispatcher_task and not outbound_dispatcher_task.done():
+        return
+    outbound_global_bucket = TokenBucket(OUTBOUND_GLOBAL_LIMIT, 1, clock.now().timestamp())
+    outbound_wakeup = asyncio.Event()
+    outbound_dispatcher_task = asyncio.create_task(outbound_dispatcher())
+
+async def send_reply(channel, content):
+    """Sends a command reply through the outbound scheduler, booked against the running command."""
+    return await outbound("reply", api_call_site.get(), "send", channel, lambda: channel.send(content))
+
+def render_histogram(name, histogram, labels=""):
+    """Returns Prometheus text lines for one histogram, buckets cumulative."""
+    lines = []
+    cumulative = 0
+    for bound, count in zip((*histogram.bounds, "+Inf"), histogram.buckets):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.total:.6f}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+def render_metrics():
+    """Returns every metric in the Prometheus text format."""
+    lines = [f"castle_uptime_seconds {time.monotonic() - metrics_started:.0f}"]
+    if ingest_queue is not None:
+        lines.append(f"castle_ingest_queue_depth {ingest_queue.qsize()}")
+    for name, count in sorted(metric_counts.items()):
+        lines.append(f"castle_{name}_total {count}")
+    for (site, kind), count in sorted(api_calls.items()):
+        lines.append(f'castle_api_calls_total{{site="{site}",kind="{kind}"}} {count}')
+    for (site, status), count in sorted(api_errors.items()):
+        lines.append(f'castle_api_errors_total{{site="{site}",status="{status}"}} {count}')
+    for (site, status), count in sorted(http_responses.items()):
+        lines.append(f'castle_http_responses_total{{site="{site}",status="{status}"}} {count}')
+    lines.extend(render_histogram("castle_report_propagation_seconds", propagation_latency))
+    for lane, queue, histogram in zip(OUTBOUND_LANES, outbound_lanes, outbound_wait):
+        lines.append(f'castle_outbound_queue_depth{{lane="{lane}"}} {len(queue)}')
+        lines.append(f'castle_outbound_coalesced_total{{lane="{lane}"}} {outbound_coalesced[lane]}')
+        lines.append(f'castle_outbound_dropped_total{{lane="{lane}"}} {outbound_dropped[lane]}')
+        lines.extend(render_histogram("castle_outbound_wait_seconds", histogram, f'lane="{lane}"'))
+    for kind, histogram in sorted(api_latency.items()):
+        lines.extend(render_histogram("castle_api_call_seconds", histogram, f'kind="{kind}"'))
+    return "\n".join(lines) + "\n"
+
+async def metrics_handler(request):
+    return web.Response(text=render_metrics())
+
+async def spawns_export_handler(request):
+    """Streams the spawn store as CSV for offline analysis, a chunk at a time."""
+    response = web.StreamResponse(headers={"Content-Type": "text/csv; charset=utf-8"})
+    await response.prepare(request)
+    if os.path.exists(SPAWN_STORE_PATH):
+        with open(SPAWN_STORE_PATH, "rb") as store:
+            while chunk := store.read(SPAWN_EXPORT_CHUNK):
+                await response.write(chunk)
+    await response.write_eof()
+    return response
+
+async def start_metrics_server():
+    """Serves /metrics and /spawns.csv on METRICS_HOST:METRICS_PORT once, even if on_ready fires again after a reconnect."""
+    global metrics_runner
+
+    if not METRICS_PORT or metrics_runner:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    app.router.add_get("/spawns.csv", spawns_export_handler)
+    metrics_runner = web.AppRunner(app, access_log=None)
+    await metrics_runner.setup()
+    try:
+        await web.TCPSite(metrics_runner, METRICS_HOST, METRICS_PORT).start()
+        enhanced_print(f"Metrics endpoint listening on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    except OSError as e:
+        enhanced_print(f"Metrics endpoint failed to start: {e}", level="warning")
+
+# On-demand profiling: nothing below runs, and the wrapped handlers only check one global, until a session starts
+class Profiler:
+    """One profiling session: stack sampling for CPU, tracemalloc for memory, event loop lag and time per handler."""
+
+    __slots__ = ("started_at", "started", "thread_id", "stop_event", "sampler", "self_samples", "stack_samples",
+                 "samples", "idle_samples", "sections", "loop_lag", "lag_task", "memory_before")
+
+    def __init__(self):
+        self.started_at = datetime.now(clock.tz)
+        self.started = time.perf_counter()
+        self.thread_id = threading.get_ident()  # The event loop's thread, the one sampled
+        self.stop_event = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name="profiler", daemon=True)
+        self.self_samples = Counter()  # Function -> samples where it was running
+        self.stack_samples = Counter()  # Function -> samples where it was anywhere on the stack
+        self.samples = 0
+        self.idle_samples = 0  # Loop waiting in select(), nothing to do
+        self.sections = {}  # Handler -> Histogram of its wall time
+        self.loop_lag = Histogram(LOOP_LAG_BUCKETS)
+        self.lag_task = None
+        self.memory_before = None
+
+    def start(self):
+        tracemalloc.start()
+        self.memory_before = tracemalloc.take_snapshot()
+        self.sampler.start()
+        self.lag_task = asyncio.create_task(self.measure_lag())
+
+    def sample(self):
+        """Runs on its own thread, records where the event loop thread is every PROFILE_SAMPLE_INTERVAL."""
+        while not self.stop_event.wait(PROFILE_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            if frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py"):
+                self.idle_samples += 1
+                continue
+            self.self_samples[frame_label(frame.f_code)] += 1
+            seen = set()
+            while frame is not None:
+                label = frame_label(frame.f_code)
+                if label not in seen:  # Recursion counts once
+                    seen.add(label)
+                    self.stack_samples[label] += 1
+                frame = frame.f_back
+
+    async def measure_lag(self):
+        """Sleeps PROFILE_LAG_INTERVAL at a time, any oversleep is time the loop was busy elsewhere."""
+        while True:
+            expected = time.perf_counter() + PROFILE_LAG_INTERVAL
+            await asyncio.sleep(PROFILE_LAG_INTERVAL)
+            self.loop_lag.observe(max(0.0, time.perf_counter() - expected))
+
+    def record(self, section, seconds):
+        histogram = self.sections.get(section)
+        if histogram is None:
+            histogram = self.sections[section] = Histogram(PROFILE_SECTION_BUCKETS)
+        histogram.observe(seconds)
+
+    def stop(self):
+        """Ends the session and returns its top-N summary as text."""
+        self.stop_event.set()
+        self.sampler.join()
+        self.lag_task.cancel()
+        memory_growth = tracemalloc.take_snapshot().compare_to(self.memory_before, "lineno")
+        tracemalloc.stop()
+
+        elapsed = time.perf_counter() - self.started
+        busy = max(self.samples - self.idle_samples, 1)
+        lines = [
+            f"Profile from {self.started_at:%Y-%m-%d %H:%M:%S %Z}, {elapsed:.1f}s, {self.samples} samples, "
+            f"loop busy {100 * (self.samples - self.idle_samples) / max(self.samples, 1):.1f}%",
+            "",
+            f"{'handler':<36}{'calls':>8}{'total s':>10}{'mean ms':>10}{'p99 ms':>10}",
+        ]
+        for section, histogram in sorted(self.sections.items(), key=lambda item: -item[1].total):
+            p99 = histogram.quantile(0.99)
+            p99 = f">{histogram.bounds[-1] * 1e3:.0f}" if p99 == float("inf") else f"{p99 * 1e3:.1f}"
+            lines.append(f"{section:<36}{histogram.count:>8}{histogram.total:>10.3f}"
+                         f"{histogram.total / histogram.count * 1e3:>10.3f}{p99:>10}")
+
+        p99 = self.loop_lag.quantile(0.99)
+        lines += ["", f"Event loop lag over {self.loop_lag.count} probes: mean "
+                      f"{self.loop_lag.total / max(self.loop_lag.count, 1) * 1e3:.1f}ms, p99 <= "
+                      f"{'-' if p99 is None else f'{p99 * 1e3:.0f}ms'}"]
+
+        for title, counts in (("CPU, self", self.self_samples), ("CPU, including callees", self.stack_samples)):
+            lines += ["", f"{title} (% of busy samples):"]
+            lines += [f"{100 * count / busy:6.1f}%  {label}" for label, count in counts.most_common(PROFILE_TOP_N)]
+
+        lines += ["", "Memory growth by line:"]
+        lines += [f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8} blocks  {stat.traceback}"
+                  for stat in memory_growth[:PROFILE_TOP_N]]
+        return "\n".join(lines) + "\n"
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+profiler = None  # The running Profiler, None when profiling is off
+startup_profiling_started = False  # PROFILE_ON_START opens one session per process, not one per on_ready
+
+def start_profiling():
+    """Starts a profiling session, returns False if one is already running."""
+    global profiler
+
+    if profiler is not None:
+        return False
+    profiler = Profiler()
+    profiler.start()
+    enhanced_print("Profiling started")
+    return True
+
+def start_startup_profiling():
+    """Starts the PROFILE_ON_START session once, so a reconnect doesn't restart one the owner stopped."""
+    global startup_profiling_started
+
+    if PROFILE_ON_START and not startup_profiling_started:
+        startup_profiling_started = True
+        start_profiling()
+
+def stop_profiling():
+    """Stops the running session and writes its summary to PROFILE_OUTPUT_DIR, returns the file path or None."""
+    global profiler
+
+    if profiler is None:
+        return None
+    session, profiler = profiler, None  # Wrapped handlers stop recording right away
+    summary = session.stop()
+    os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_OUTPUT_DIR, f"profile-{session.started_at:%Y%m%d-%H%M%S}.txt")
+    with open(path, "w", encoding="utf-8") as summary_file:
+        summary_file.write(summary)
+    enhanced_print(f"Profiling stopped, summary written to {path}")
+    return path
+
+def profiled(section):
+    """Times every call of a coroutine function as section while a profiling session runs."""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if profiler is None:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.record(section, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def gateway_options(low_memory):
+    """Returns the intents and cache options for the bot, in low-memory mode just what it actually reads."""
+    if not low_memory:
+        intents = discord.Intents.default()
+        intents.message_content = True  # Enable message content intent
+        intents.guilds = True  # Enable guild intent for accessing guild information
+        return {"intents": intents}
+
+    # Guilds for the channel lookups, guild messages for reports and commands. No DMs, reactions, typing,
+    # voice, emoji or invite events, the gateway doesn't even send them
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.message_content = True
+    return {
+        "intents": intents,
+        "max_messages": None,  # Reports are edited through stored handles, nothing reads the message cache
+        "member_cache_flags": discord.MemberCacheFlags.none(),  # The bot's own member is still kept, for !permissions
+        "chunk_guilds_at_startup": False,
+    }
+
+# Auto sharded so one process can serve many guilds, discord.py picks the shard count
+bot = commands.AutoShardedBot(command_prefix="!", help_command=None, http_trace=http_trace, **gateway_options(LOW_MEMORY))
+
+def get_channel(channel_id):
+    """Looks up a channel in the gateway cache. Offline replays swap this for in-memory channels."""
+    return bot.get_channel(channel_id)
+
+log_queue = deque()  # Pending lines for the Discord log channel
+log_queue_chars = 0  # Total length of the pending lines
+dropped_log_lines = 0  # Lines dropped since the last flush because the queue was full
+log_flush_event = None  # Wakes the flusher early once a full block is waiting
+log_flusher_task = None
+
+def pack_log_blocks(lines, limit=LOG_BLOCK_LIMIT):
+    """Groups log lines into as few code blocks as possible, each fitting in one Discord message."""
+    budget = limit - 6  # Room for the ``` fences
+    blocks = []
+    current = []
+    current_len = 0
+
+    for line in lines:
+        line = line.replace("`", "'")  # Don't let user content close the code block
+        if len(line) > budget:
+            line = line[:budget - 3] + "..."
+
+        # +1 for the newline joining it to the previous line
+        if current and current_len + 1 + len(line) > budget:
+            blocks.append(current)
+            current = []
+            current_len = 0
+
+        current_len += len(line) + (1 if current else 0)
+        current.append(line)
+
+    if current:
+        blocks.append(current)
+
+    return blocks
+
+@profiled("flush_logs")
+async def flush_logs():
+    """Sends queued log lines to the Discord log channel, packed into at most LOG_BLOCKS_PER_FLUSH messages."""
+    global log_queue_chars, dropped_log_lines
+
+    if not log_queue and not dropped_log_lines:
+        return
 
-    for channel_id in SOURCE_CHANNEL_IDS:
-        channel = bot.get_channel(channel_id)
-        if not channel:
-            continue
+    log_channel = get_channel(LOG_CHANNEL_ID)
+    if not log_channel:
+        return
 
+    lines = []
+    if dropped_log_lines:
+        lines.append(f"... dropped {dropped_log_lines} log line(s), log queue was full")
+        dropped_log_lines = 0
+
+    # Take what fits in this flush and leave the rest queued for the next one. A line costs at most
+    # one block since pack_log_blocks truncates it, so an overlong line at the head is still taken
+    block_budget = LOG_BLOCK_LIMIT - 6
+    budget = LOG_BLOCKS_PER_FLUSH * block_budget
+    taken = sum(len(line) + 1 for line in lines)
+    while log_queue and taken + min(len(log_queue[0]), block_budget) < budget:
+        line = log_queue.popleft()
+        log_queue_chars -= len(line)
+        taken += min(len(line), block_budget) + 1
+        lines.append(line)
+
+    blocks = pack_log_blocks(lines)
+
+    # Lines that didn't fit after packing go back to the front of the queue
+    for block in reversed(blocks[LOG_BLOCKS_PER_FLUSH:]):
+        log_queue.extendleft(reversed(block))
+        log_queue_chars += sum(len(line) for line in block)
+
+    for block in blocks[:LOG_BLOCKS_PER_FLUSH]:
         try:
-            async for message in channel.history(limit=100, after=cutoff_time):
-                if message.author.bot:
-                    continue
-
-                boss_name = extract_boss_name(message.content)
-                floor = extract_floor(message.content)
-
-                if boss_name and floor:
-                    emoji = BOSS_EMOJIS.get(boss_name.lower(), "")
-                    enhanced_print(f"Found recent report: Floor {floor}, Boss: {boss_name}")
-
-                    # Track reports per floor
-                    boss_data = reported_bosses[floor]
-                    boss_data["reports"][boss_name] = boss_data["reports"].get(boss_name, 0) + 1
-
-                    # Update current boss based on reports (require 3+ for changes)
-                    if len(boss_data["reports"]) == 1:
-                        boss_data["current_boss"] = (boss_name, emoji)
-                    else:
-                        # Find boss with 3+ reports
-                        boss_with_3_plus = None
-                        for boss, count in boss_data["reports"].items():
-                            if count >= 3:
-                                boss_with_3_plus = boss
-                                break
-                        
-                        if boss_with_3_plus:
-                            boss_data["current_boss"] = (boss_with_3_plus, BOSS_EMOJIS.get(boss_with_3_plus.lower(), ""))
-                        # If no boss has 3+ reports, keep the first reported boss
-                        elif not boss_data.get("current_boss"):
-                            first_boss = list(boss_data["reports"].keys())[0]
-                            boss_data["current_boss"] = (first_boss, BOSS_EMOJIS.get(first_boss.lower(), ""))
+            content = "```" + "\n".join(block) + "```"
+            await outbound("log", "flush_logs", "send", log_channel, lambda: log_channel.send(content))
         except Exception as e:
-            enhanced_print(f"Error scanning channel {channel_id}: {e}")
+            print(f"Failed to log to Discord: {e}")
+
+async def log_flusher():
+    """Flushes the log queue every LOG_FLUSH_INTERVAL seconds, or as soon as a full block is waiting."""
+    while True:
+        try:
+            await asyncio.wait_for(log_flush_event.wait(), timeout=LOG_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        log_flush_event.clear()
+        await flush_logs()
+
+def start_log_flusher():
+    """Starts the log flusher once, even if on_ready fires again after a reconnect."""
+    global log_flush_event, log_flusher_task
+
+    if log_flusher_task and not log_flusher_task.done():
+        return
+    log_flush_event = asyncio.Event()
+    log_flusher_task = asyncio.create_task(log_flusher())
+
+def enhanced_print(message, level="info"):
+    """Print to console and queue for the Discord log channel if at or above LOG_CHANNEL_LEVEL."""
+    global log_queue_chars, dropped_log_lines
+
+    print(message)
+    if LOG_LEVELS[level] < LOG_LEVELS[LOG_CHANNEL_LEVEL]:
+        return  # Debug chatter stays on stdout
+
+    if len(log_queue) >= LOG_QUEUE_LIMIT:
+        dropped_log_lines += 1
+        return
 
-async def post_report():
-    """Posts a new report only at xx:44, then edits that report for the next 11 minutes."""
-    global latest_message_id, latest_message_timestamp
+    message = str(message)
+    log_queue.append(message)
+    log_queue_chars += len(message)
+    if log_flush_event and log_queue_chars >= LOG_BLOCK_LIMIT:
+        log_flush_event.set()
+
+# Registry of the bot's own report messages, per guild and keyed by the hour they were posted for
+REPORT_REGISTRY_SIZE = 24  # Hours of report handles to keep per guild
+
+def report_hour_key(moment):
+    """Truncates a report time to the hour it belongs to, as a UTC instant so a repeated DST hour gets its own key."""
+    return moment.replace(minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+
+def register_report(guild, channel, message_id, posted_at):
+    """Stores an edit handle for a guild's report so later edits don't need fetch_message."""
+    key = report_hour_key(posted_at)
+    guild.report_messages[key] = channel.get_partial_message(message_id)
+    guild.report_messages.move_to_end(key)
+    while len(guild.report_messages) > REPORT_REGISTRY_SIZE:
+        _, dropped = guild.report_messages.popitem(last=False)
+        guild.report_digests.pop(dropped.id, None)
+
+    journal("report", guild=guild.guild_id, channel_id=channel.id, message_id=message_id, posted_at=posted_at.isoformat())
+
+def forget_report(guild, message_id):
+    """Drops a report that no longer exists."""
+    for key in [key for key, report in guild.report_messages.items() if report.id == message_id]:
+        del guild.report_messages[key]
+    guild.report_digests.pop(message_id, None)
+    journal("forget_report", guild=guild.guild_id, message_id=message_id)
+
+def current_report(guild, now):
+    """Returns the edit handle of the guild's report for this hour, if one was posted."""
+    return guild.report_messages.get(report_hour_key(now))
+
+def latest_report(guild):
+    """Returns the edit handle of the guild's most recently posted report, if any."""
+    if not guild.report_messages:
+        return None
+    return next(reversed(guild.report_messages.values()))
+
+# Append-only journal of state changes, replayed on startup so restarts keep their state
+journal_file = None  # Opened by restore_state(), journal() is a no-op until then
+journal_lines = 0
+
+def journal(event, **fields):
+    """Appends one state change to the journal."""
+    global journal_lines
+
+    if journal_file is None:
+        return
 
-    now = datetime.utcnow() + timedelta(hours=2)  # Adjust for your timezone
+    journal_file.write(json.dumps({"event": event, **fields}) + "\n")
+    journal_file.flush()
+    journal_lines += 1
+    if journal_lines >= JOURNAL_COMPACT_LINES:
+        compact_journal()
+
+def snapshot_events():
+    """Yields the current state of every guild as journal events."""
+    for guild in guilds.values():
+        guild_id = guild.guild_id
+        if guild.last_report_hour:
+            yield {"event": "posted_hour", "guild": guild_id, "hour": guild.last_report_hour.isoformat()}
+        for key, report in guild.report_messages.items():
+            yield {"event": "report", "guild": guild_id, "channel_id": report.channel.id, "message_id": report.id,
+                   "posted_at": key.isoformat()}
+        for castle_round in reversed(guild.rounds.recent(ROUND_HISTORY_SIZE)):
+            yield {"event": "round", "guild": guild_id, **castle_round.to_record()}
+        for channel_id, message_id in guild.backfill_watermarks.items():
+            yield {"event": "watermark", "guild": guild_id, "channel_id": channel_id, "message_id": message_id}
+
+def compact_journal():
+    """Rewrites the journal as a snapshot of the current state."""
+    global journal_file, journal_lines
+
+    if journal_file:
+        journal_file.close()
+
+    temp_path = STATE_JOURNAL_PATH + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as snapshot:
+        for event in snapshot_events():
+            snapshot.write(json.dumps(event) + "\n")
+    os.replace(temp_path, STATE_JOURNAL_PATH)
+
+    journal_file = open(STATE_JOURNAL_PATH, "a", encoding="utf-8")
+    journal_lines = 0
+
+def apply_journal_event(entry, late_tallies):
+    """Replays one journal event onto the in-memory state, without Discord calls. Tallies a vote landed behind
+    others in are added to late_tallies, for the caller to settle once at the end."""
+    # Journals from before multi-guild support have no guild field, they belong to the default guild
+    guild = guilds.get(entry.get("guild", DEFAULT_GUILD_ID))
+    if guild is None:
+        return  # Guild no longer configured
+
+    event = entry["event"]
+    if event == "vote":
+        timestamp = datetime.fromisoformat(entry["ts"])
+        tally = vote_tally(guild, entry["floor"], timestamp)
+        if tally:
+            if tally.add_vote(entry["voter"], entry["boss"], timestamp, entry["message_id"], defer_recount=True) == "deferred":
+                late_tallies.add(tally)
+    elif event == "set_boss":
+        tally = vote_tally(guild, entry["floor"], datetime.fromisoformat(entry["hour"]))
+        if tally:
+            tally.set_boss(entry["boss"])
+    elif event == "retract":
+        tally = vote_tally(guild, entry["floor"], datetime.fromisoformat(entry["hour"]))
+        if tally:
+            tally.retract(entry["message_id"])
+    elif event == "round":
+        guild.rounds.restore(CastleRound.from_record(entry))
+    elif event == "clear":
+        castle_round = round_for(guild, datetime.fromisoformat(entry["hour"]))
+        if castle_round:
+            castle_round.reset()
+        guild.backfill_watermarks.clear()
+    elif event == "watermark":
+        guild.backfill_watermarks[entry["channel_id"]] = entry["message_id"]
+    elif event == "notified":
+        castle_round = round_for(guild, datetime.fromisoformat(entry["hour"]))
+        if castle_round:
+            castle_round.notified.add(entry["floor"])
+    elif event == "unnotified":
+        castle_round = round_for(guild, datetime.fromisoformat(entry["hour"]))
+        if castle_round:
+            castle_round.notified.discard(entry["floor"])
+    elif event == "posted_hour":
+        guild.last_report_hour = datetime.fromisoformat(entry["hour"])
+    elif event == "report":
+        channel = get_channel(entry["channel_id"]) or bot.get_partial_messageable(entry["channel_id"])
+        register_report(guild, channel, entry["message_id"], datetime.fromisoformat(entry["posted_at"]))
+    elif event == "forget_report":
+        forget_report(guild, entry["message_id"])
+
+def restore_state():
+    """Replays the journal into memory, then compacts it and opens it for appending."""
+    if journal_file is not None:
+        return  # Already restored
+
+    replayed = 0
+    late_tallies = set()
+    if os.path.exists(STATE_JOURNAL_PATH):
+        with open(STATE_JOURNAL_PATH, encoding="utf-8") as existing:
+            for line in existing:
+                try:
+                    apply_journal_event(json.loads(line), late_tallies)
+                    replayed += 1
+                except (ValueError, KeyError) as e:
+                    enhanced_print(f"Skipping bad journal line: {e}", level="warning")
+    for tally in late_tallies:
+        tally.settle()
+
+    compact_journal()
+    enhanced_print(f"Restored state from {replayed} journal event(s)")
+
+# Spawn analytics: each finished round is appended to a CSV store, aggregate counters over it are kept next to it
+SPAWN_STORE_HEADER = ["hour", "guild", "floor", "boss", "voters"]
+
+spawn_counts = {}  # Guild ID -> floor -> boss -> sightings per hour of day in the report time zone (24 counts)
+spawn_rounds = Counter()  # Guild ID -> rounds archived
+spawn_last_hour = {}  # Guild ID -> hour key (ISO) of its last archived round
+spawn_store_offset = 0  # Bytes of the store the counters cover
+spawn_stats_restored = False
+
+def count_spawn(guild_id, hour, floor, boss):
+    """Adds one archived floor result to the aggregates, a new hour for the guild starts a new round."""
+    if spawn_last_hour.get(guild_id) != hour:
+        spawn_last_hour[guild_id] = hour
+        spawn_rounds[guild_id] += 1
+    hours = spawn_counts.setdefault(guild_id, {}).setdefault(floor, {}).setdefault(boss, [0] * 24)
+    hours[datetime.fromisoformat(hour).astimezone(clock.tz).hour] += 1
+
+def save_spawn_stats():
+    """Writes the aggregates and the store offset they cover."""
+    temp_path = SPAWN_STATS_PATH + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as stats_file:
+        json.dump({
+            "offset": spawn_store_offset,
+            "rounds": spawn_rounds,
+            "last_hour": spawn_last_hour,
+            "counts": spawn_counts,
+        }, stats_file)
+    os.replace(temp_path, SPAWN_STATS_PATH)
+
+def restore_spawn_stats():
+    """Loads the saved aggregates, then folds in store rows written after they were saved."""
+    global spawn_store_offset, spawn_stats_restored
+
+    if spawn_stats_restored:
+        return  # Already restored, on_ready fired again after a reconnect
+    spawn_stats_restored = True
+
+    if os.path.exists(SPAWN_STATS_PATH):
+        with open(SPAWN_STATS_PATH, encoding="utf-8") as stats_file:
+            saved = json.load(stats_file)
+        spawn_store_offset = saved["offset"]
+        spawn_rounds.update({int(guild_id): rounds for guild_id, rounds in saved["rounds"].items()})
+        spawn_last_hour.update({int(guild_id): hour for guild_id, hour in saved["last_hour"].items()})
+        spawn_counts.update({int(guild_id): floors for guild_id, floors in saved["counts"].items()})
+
+    if not os.path.exists(SPAWN_STORE_PATH):
+        return
+    if os.path.getsize(SPAWN_STORE_PATH) < spawn_store_offset:
+        # Store was replaced or truncated, the saved aggregates don't describe it anymore
+        spawn_store_offset = 0
+        spawn_rounds.clear()
+        spawn_last_hour.clear()
+        spawn_counts.clear()
+
+    folded = 0
+    with open(SPAWN_STORE_PATH, "rb") as store:
+        store.seek(spawn_store_offset)
+        for line in store:
+            if not line.endswith(b"\n"):
+                break  # Half-written last row, it gets written again with the next round
+            spawn_store_offset += len(line)
+            row = next(csv.reader([line.decode("utf-8")]))
+            if row == SPAWN_STORE_HEADER:
+                continue
+            hour, guild_id, floor, boss, _ = row
+            count_spawn(int(guild_id), hour, floor, boss)
+            folded += 1
+
+    if folded:
+        save_spawn_stats()
+    enhanced_print(f"Spawn stats cover {sum(spawn_rounds.values())} round(s), {folded} row(s) folded in from the store")
+
+def archive_round(guild, castle_round):
+    """Appends a finished round's boss per floor to the spawn store and the aggregates, once per guild and hour."""
+    global spawn_store_offset
+
+    hour = castle_round.hour.isoformat()
+    if spawn_last_hour.get(guild.guild_id) == hour:
+        return
+    results = [(floor, boss, voters) for floor, (boss, voters) in zip(castle_round.floors, castle_round.standings()) if boss]
+    if not results:
+        return  # Nobody reported this hour, nothing to learn from it
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if not os.path.exists(SPAWN_STORE_PATH) or os.path.getsize(SPAWN_STORE_PATH) == 0:
+        writer.writerow(SPAWN_STORE_HEADER)
+    writer.writerows([hour, guild.guild_id, floor, boss, voters] for floor, boss, voters in results)
+
+    with open(SPAWN_STORE_PATH, "ab") as store:
+        store.write(buffer.getvalue().encode("utf-8"))  # One write per round
+        spawn_store_offset = store.tell()
+    for floor, boss, _ in results:
+        count_spawn(guild.guild_id, hour, floor, boss)
+    save_spawn_stats()
+    enhanced_print(f"[{guild.name}] Archived {len(results)} floor result(s) for the {castle_round.hour.astimezone(clock.tz).strftime('%H')}:00 round", level="debug")
+
+async def fetch_channel_reports(guild, channel_id, cutoff_time):
+    """Reads one source channel from its watermark (or the cutoff) to now and returns (reports, newest ID)."""
+    channel = get_channel(channel_id)
+    watermark = guild.backfill_watermarks.get(channel_id)
+    if not channel:
+        return [], watermark
+
+    # Only fetch what the last scan didn't see, unless that's older than the window anyway
+    after = cutoff_time
+    if watermark and discord.utils.snowflake_time(watermark) > cutoff_time:
+        after = discord.Object(id=watermark)
+
+    reports = []
+    newest = watermark
+    scanned = 0
+    api_calls["backfill", "history"] += 1
+    token = api_call_site.set("backfill")
+    try:
+        # limit above 100 makes the library page through the whole window
+        async for message in channel.history(limit=BACKFILL_MAX_MESSAGES, after=after):
+            scanned += 1
+            if scanned % 100 == 1 and scanned > 1:
+                api_calls["backfill", "history"] += 1  # The library fetched another page of 100
+            newest = max(newest or 0, message.id)
+            if message.author.bot:
+                continue
+
+            floor, boss_name = parse_report(message.content)
+
+            if boss_name and floor:
+                enhanced_print(f"Found recent report: Floor {floor}, Boss: {boss_name}", level="debug")
+                reports.append((message.created_at, message.id, floor, boss_name, message.author.id))
+    except Exception as e:
+        if isinstance(e, discord.HTTPException):
+            api_errors["backfill", e.status] += 1
+        enhanced_print(f"[{guild.name}] Error scanning channel {channel_id}: {e}", level="error")
+        return reports, watermark  # Keep the old watermark so the next scan retries this stretch
+    finally:
+        api_call_site.reset(token)
+        metric_counts["backfill_messages"] += scanned
+
+    return reports, newest
+
+@profiled("scan_recent_messages_for_bosses")
+async def scan_recent_messages_for_bosses(guild):
+    """Reads new messages from the last 10 minutes in all of a guild's source channels at once and counts their reports."""
+    cutoff_time = clock.now() - BACKFILL_WINDOW
+
+    enhanced_print(f"[{guild.name}] Scanning recent messages to rebuild boss data...")
+
+    channel_ids = list(guild.source_channel_ids)
+    results = await asyncio.gather(*(fetch_channel_reports(guild, channel_id, cutoff_time) for channel_id in channel_ids))
+
+    found_reports = []
+    for channel_id, (reports, newest) in zip(channel_ids, results):
+        found_reports.extend(reports)
+        if newest and newest != guild.backfill_watermarks.get(channel_id):
+            guild.backfill_watermarks[channel_id] = newest
+            journal("watermark", guild=guild.guild_id, channel_id=channel_id, message_id=newest)
+
+    # Apply in posting order across channels, the same order on_message sees them in
+    found_reports.sort()
+    changed_at = None
+    late_tallies = set()
+    for created_at, message_id, floor, boss_name, voter in found_reports:
+        if record_vote(guild, floor, boss_name, voter, created_at, message_id, late_tallies) and changed_at is None:
+            changed_at = created_at
+    # Reports older than ones already counted (dropped from a burst, say) are recounted once per floor
+    for tally in late_tallies:
+        previous_boss = tally.current_boss
+        tally.settle()
+        if tally.current_boss != previous_boss and changed_at is None:
+            changed_at = found_reports[0][0]
+    if changed_at:
+        mark_report_dirty(guild, changed_at)
+
+@profiled("post_report")
+async def post_report(guild):
+    """Posts a guild's new report only at xx:44, then edits that report for the next 11 minutes."""
+    now = clock.now()
     if now.minute < 44 or now.minute > 55:
         return  # Stop updating outside the allowed time window
 
-    target_channel = bot.get_channel(TARGET_CHANNEL_ID)
+    target_channel = get_channel(guild.target_channel_id)
     if not target_channel:
-        enhanced_print("Target channel not found.")
+        enhanced_print(f"[{guild.name}] Target channel not found.")
         return
 
     # Determine if we should post a new report (only at xx:44)
     should_post_new = now.minute == 44
 
-    # If we have a latest_message_id but it's not xx:44, try to edit existing message
-    if latest_message_id and latest_message_timestamp and not should_post_new:
+    # If this hour's report exists and it's not xx:44, edit it in place
+    report = current_report(guild, now)
+    if report and not should_post_new:
         try:
-            msg = await target_channel.fetch_message(latest_message_id)
-            # Verify this message is from the current hour (xx:44 of this hour)
-            message_hour = latest_message_timestamp.hour
-            current_hour = now.hour
-
-            if message_hour == current_hour:
-                # This is the correct message from this hour's xx:44 posting
-                await msg.edit(content=await build_report_content())
-                enhanced_print(f"Edited existing report (ID: {latest_message_id})")
-                return
-            else:
-                # This message is from a previous hour, we need a new one
-                enhanced_print("Report is from previous hour, need new report")
-                should_post_new = True
-
+            if await edit_report(guild, report, await build_report_content(guild), "post_report"):
+                enhanced_print(f"[{guild.name}] Edited existing report (ID: {report.id})")
+            return
         except discord.NotFound:
-            enhanced_print("Existing report not found, will post new one and scan recent messages.")
-            latest_message_id = None
-            latest_message_timestamp = None
-            # Scan recent messages to rebuild floor data
-            await scan_recent_messages_for_bosses()
+            enhanced_print(f"[{guild.name}] Existing report not found, will post new one and scan recent messages.")
+            forget_report(guild, report.id)
             should_post_new = True
         except discord.HTTPException as e:
-            enhanced_print(f"Failed to edit message {latest_message_id}: {e}")
-            if should_post_new:
-                latest_message_id = None
+            enhanced_print(f"[{guild.name}] Failed to edit message {report.id}: {e}", level="error")
+            return
 
-    # Post new report only at xx:44 or if previous message was deleted/invalid
-    if should_post_new or latest_message_id is None:
-        # If posting at xx:44, scan recent messages first to get latest floor data
-        if should_post_new:
-            await scan_recent_messages_for_bosses()
+    # Post new report only at xx:44 or if this hour's report is missing or was deleted
+    if should_post_new or report is None:
+        # Scan recent messages first to get latest floor data
+        await scan_recent_messages_for_bosses(guild)
 
         try:
-            report_content = await build_report_content()
-            msg = await target_channel.send(report_content)
-            latest_message_id = msg.id
-            latest_message_timestamp = now
-            enhanced_print(f"Posted new report (ID: {latest_message_id}) at {now.strftime('%H:%M')}")
+            changed_at = take_report_change(guild)
+            report_content = await build_report_content(guild)
+            msg = await outbound("report", "post_report", "send", target_channel, lambda: target_channel.send(report_content))
+            register_report(guild, target_channel, msg.id, now)
+            guild.report_digests[msg.id] = hash(report_content)
+            if changed_at and report_hour_key(changed_at.astimezone(clock.tz)) == report_hour_key(now):
+                observe_propagation(changed_at)  # Changes left over from last hour's round never show
+            enhanced_print(f"[{guild.name}] Posted new report (ID: {msg.id}) at {now.strftime('%H:%M')}")
         except discord.HTTPException as e:
-            enhanced_print(f"Failed to send new message: {e}")
+            enhanced_print(f"[{guild.name}] Failed to send new message: {e}", level="error")
 
-async def build_report_content():
-    """Builds the report content with current boss data."""
-    now = datetime.utcnow() + timedelta(hours=2)
+def render_floor_lines(castle_round, snapshot):
+    """Returns the report's floor lines for a round, every floor listed even if no boss is confirmed yet."""
+    lines = []
+    for floor, boss_name in castle_round.bosses():
+        if boss_name:
+            lines.append(f"**Floor {floor}** - {snapshot.emoji(boss_name)} **{boss_name}**")
+        else:
+            lines.append(f"**Floor {floor}** - ⏳ *Loading*")  # Default cooldown emoji
+    return "\n".join(lines)
+
+async def build_report_content(guild):
+    """Builds a guild's report content with its current boss data."""
+    now = clock.now()
 
     # Create the styled report header
     report_lines = ["**INFERNAL CASTLE SPAWNED**"]
     report_lines.append("─" * 35)
 
-    # Ensure all floors are listed, even if no boss is confirmed yet
-    for floor in sorted(VALID_FLOORS, key=int):
-        boss_data = reported_bosses[floor]
-        if boss_data["current_boss"]:
-            boss_name, emoji = boss_data["current_boss"]
-            report_lines.append(f"**Floor {floor}** - {emoji} **{boss_name}**")
-        else:
-            report_lines.append(f"**Floor {floor}** - ⏳ *Loading*")  # Default cooldown emoji
+    # Floor lines only change with the round's version, the catalog or the hour, re-rendered only then
+    castle_round = current_round(guild)
+    key = (guild.report_version, castle_round.hour, catalog)
+    if guild.rendered_floors is None or guild.rendered_floors[0] != key:
+        guild.rendered_floors = (key, render_floor_lines(castle_round, catalog))
+    report_lines.append(guild.rendered_floors[1])
 
     report_lines.append("─" * 35)
 
@@ -219,128 +1684,357 @@ async def build_report_content():
     report_lines.append("")
     report_lines.append("-# By Spidy Hub  .gg/mHBBXKjmcP")
 
-    return f"<@&{PING_ROLE_ID}>\n" + "\n".join(report_lines)
+    return f"<@&{guild.ping_role_id}>\n" + "\n".join(report_lines)
+
+report_scheduler_tasks = {}  # Guild ID -> that guild's report scheduler task
+
+def report_window(now):
+    """Returns (post_at, window_end) for the current or next report cycle."""
+    # Worked out in UTC so a repeated or skipped DST hour still gets exactly one cycle
+    hour_start = now.replace(minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+    if now.timestamp() >= (hour_start + timedelta(minutes=REPORT_EDIT_END_MINUTE + 1)).timestamp():
+        hour_start += timedelta(hours=1)
+
+    post_at = (hour_start + timedelta(minutes=REPORT_POST_MINUTE)).astimezone(now.tzinfo)
+    window_end = (hour_start + timedelta(minutes=REPORT_EDIT_END_MINUTE + 1)).astimezone(now.tzinfo)
+    return post_at, window_end
+
+def mark_report_dirty(guild, changed_at=None):
+    """Tells the guild's edit window that its report content changed, changed_at being when the triggering message was posted."""
+    guild.report_version += 1
+    if changed_at and (guild.report_changed_at is None or changed_at < guild.report_changed_at):
+        guild.report_changed_at = changed_at
+    if guild.report_dirty:
+        guild.report_dirty.set()
+
+def take_report_change(guild):
+    """Returns and clears the time of the oldest change the guild's next render includes."""
+    changed_at = guild.report_changed_at
+    guild.report_changed_at = None
+    return changed_at
+
+def observe_propagation(changed_at):
+    """Records how long a change took from its message to a report showing it."""
+    propagation_latency.observe(max(0.0, clock.now().timestamp() - changed_at.timestamp()))
+
+@profiled("edit_current_report")
+async def edit_current_report(guild):
+    """Edits the guild's report for this hour through its stored handle."""
+    now = clock.now()
+    report = current_report(guild, now)
+    if not report:
+        return
+
+    changed_at = take_report_change(guild)
+    try:
+        if not await edit_report(guild, report, await build_report_content(guild), "edit_window"):
+            return
+        if changed_at:
+            observe_propagation(changed_at)
+        enhanced_print(f"[{guild.name}] Edited existing report (ID: {report.id})", level="debug")
+    except discord.NotFound:
+        enhanced_print(f"[{guild.name}] Existing report not found")
+        forget_report(guild, report.id)
+    except discord.HTTPException as e:
+        enhanced_print(f"[{guild.name}] Failed to edit message: {e}", level="error")
+
+async def edit_report(guild, report, content, site):
+    """Edits a report to content, returns False without an API call when that's what it already shows."""
+    digest = hash(content)
+    if guild.report_digests.get(report.id) == digest:
+        metric_counts["report_edits_skipped"] += 1
+        return False
+
+    # Recorded before the call: a queued edit may be coalesced into a newer one, the newest content is what sticks
+    guild.report_digests[report.id] = digest
+    try:
+        await outbound("report", site, "edit", report.channel, lambda: report.edit(content=content), ("edit", report.id))
+    except Exception:
+        guild.report_digests.pop(report.id, None)
+        raise
+    return True
+
+async def bulk_edit_reports(guild, reports, content, site):
+    """Edits reports to the same content concurrently, returns message ID -> "updated", "unchanged", "deleted" or "failed (status)"."""
+    # Edits share one rate limit bucket per channel, keep at most a bucket's worth in flight per channel
+    semaphores = {}
+    for report in reports:
+        semaphores.setdefault(report.channel.id, asyncio.Semaphore(REPORT_EDIT_CONCURRENCY))
+
+    async def edit_one(report):
+        async with semaphores[report.channel.id]:
+            try:
+                return "updated" if await edit_report(guild, report, content, site) else "unchanged"
+            except discord.NotFound:
+                forget_report(guild, report.id)
+                return "deleted"
+            except discord.HTTPException as e:
+                enhanced_print(f"[{guild.name}] Failed to edit message {report.id}: {e}", level="error")
+                return f"failed ({e.status})"
+
+    results = await asyncio.gather(*(edit_one(report) for report in reports))
+    return {report.id: result for report, result in zip(reports, results)}
 
-last_report_hour = None  # Track the last hour a report was posted
+async def run_edit_window(guild, window_end):
+    """Edits the guild's report within REPORT_EDIT_DEBOUNCE of its floor data changing, until window_end."""
+    while True:
+        remaining = window_end.timestamp() - clock.now().timestamp()
+        if remaining <= 0 or not await clock.wait(guild.report_dirty, remaining):
+            return
 
-@tasks.loop(seconds=5)  # ✅ Runs every 5 seconds instead of 1
-async def update_report():
-    global last_report_hour
+        await clock.sleep(REPORT_EDIT_DEBOUNCE)  # The rest of a burst lands in this same edit
+        guild.report_dirty.clear()
+        await edit_current_report(guild)  # Changes arriving during the edit set the flag again for the next one
 
-    now = datetime.utcnow() + timedelta(hours=2)  # Adjust for your timezone
-    current_hour = now.hour
+async def report_scheduler(guild):
+    """Sleeps until xx:44, posts the guild's report for that hour once, then edits it on changes until xx:55."""
+    while True:
+        now = clock.now()
+        post_at, window_end = report_window(now)
 
-    # Post new report at xx:44 (once per hour)
-    if now.minute == 44 and last_report_hour != current_hour:
-        enhanced_print(f"Posting new report at {now.strftime('%H:%M:%S')}")
-        await post_report()
-        last_report_hour = current_hour  # ✅ Update the last report hour to prevent spam
+        # Idle until the next xx:44, no polling in between
+        if now.timestamp() < post_at.timestamp():
+            await clock.sleep_until(post_at)
+            continue
 
-    # Continuously update existing report between xx:45 and xx:55 (ONLY edit, don't post new)
-    elif 45 <= now.minute <= 55 and latest_message_id:
-        target_channel = bot.get_channel(TARGET_CHANNEL_ID)
-        if target_channel:
-            try:
-                msg = await target_channel.fetch_message(latest_message_id)
-                await msg.edit(content=await build_report_content())
-                enhanced_print(f"Edited existing report (ID: {latest_message_id})")
-            except discord.NotFound:
-                enhanced_print("Existing report not found")
-            except discord.HTTPException as e:
-                enhanced_print(f"Failed to edit message: {e}")
+        try:
+            # Still inside the window after a late wake-up, so this hour's report still gets posted
+            hour = report_hour_key(post_at)
+            if guild.last_report_hour != hour:
+                enhanced_print(f"[{guild.name}] Posting new report at {now.strftime('%H:%M:%S')}")
+                guild.report_dirty.clear()
+                await post_report(guild)
+                guild.last_report_hour = hour  # ✅ Exactly one post per hour
+                journal("posted_hour", guild=guild.guild_id, hour=hour.isoformat())
+
+            await run_edit_window(guild, window_end)
+            castle_round = guild.rounds.find(hour)
+            if castle_round:
+                archive_round(guild, castle_round)  # ✅ The bosses as they stood when the edit window closed
+        except Exception as e:
+            enhanced_print(f"[{guild.name}] Report scheduler error: {e}", level="error")
+            await clock.sleep(REPORT_RETRY_INTERVAL)
+
+def start_report_scheduler():
+    """Starts one report scheduler per guild, each once even if on_ready fires again after a reconnect."""
+    # Every guild sleeps and posts on its own task, so a slow guild never holds up another's xx:44 post
+    for guild in guilds.values():
+        task = report_scheduler_tasks.get(guild.guild_id)
+        if task and not task.done():
+            continue
+        guild.report_dirty = asyncio.Event()
+        report_scheduler_tasks[guild.guild_id] = asyncio.create_task(report_scheduler(guild))
+
+ingest_queue = None  # (GuildState, message) waiting for a worker, bounded so a burst can't grow memory
+ingest_worker_tasks = []
+ingest_rescans = set()  # Guild IDs that dropped messages since their last rescan
 
 @bot.event
+@profiled("on_message")
 async def on_message(message):
-    """Processes messages from multiple source channels and updates the report."""
-    global latest_message_id
-
+    """Runs commands and hands possible boss reports to the ingest workers, nothing else on the gateway path."""
+    metric_counts["messages_ingested"] += 1
     if message.author.bot:
         return  # Ignore bot messages
 
-    # Log all messages for debugging
-    if message.content.startswith('!'):
-        enhanced_print(f"Command detected: {message.content} from {message.author} in channel {message.channel.id}")
+    content = message.content
+    is_command = content.startswith(bot.command_prefix)
+    if is_command:
+        enhanced_print(f"Command detected: {content} from {message.author} in channel {message.channel.id}")
+
+    guild = channel_guilds.get(message.channel.id)
+    if guild is None:
+        return  # Not a channel of any configured guild
 
     # Process commands from designated channels
-    if message.channel.id in SOURCE_CHANNEL_IDS or message.channel.id == TARGET_CHANNEL_ID:
+    if is_command:
         await bot.process_commands(message)
 
-    if message.channel.id not in SOURCE_CHANNEL_IDS:
-        return  # But don't process boss reports from other channels
+    if message.channel.id not in guild.source_channel_ids or not TWO_DIGITS.search(content):
+        return  # Boss reports only come from source channels and always name a floor
 
-    enhanced_print(f"Received message from {message.channel.id}: {message.content}")
+    if ingest_queue is None:
+        await apply_ingest_batch([(guild, message)])  # Workers not started yet, apply inline
+        return
 
-    boss_name = extract_boss_name(message.content)
-    floor = extract_floor(message.content)
+    try:
+        ingest_queue.put_nowait((guild, message))
+    except asyncio.QueueFull:
+        # Backpressure: shed the message here, the rescan after the burst reads it back from history
+        metric_counts["ingest_dropped"] += 1
+        if guild.guild_id not in ingest_rescans:
+            ingest_rescans.add(guild.guild_id)
+            enhanced_print(f"[{guild.name}] Ingest queue full, dropping reports until it drains", level="warning")
 
-    if boss_name and floor:
-        emoji = BOSS_EMOJIS.get(boss_name.lower(), "")  # Get emoji or empty string if not found
-        enhanced_print(f"Detected Floor: {floor}, Boss: {boss_name}")
+@bot.event
+@profiled("on_raw_message_edit")
+async def on_raw_message_edit(payload):
+    """Moves the vote of an edited boss report to what it says now, without rescanning anything."""
+    guild = channel_guilds.get(payload.channel_id)
+    if guild is None or payload.channel_id not in guild.source_channel_ids:
+        return
+    content = payload.data.get("content")
+    author = payload.data.get("author")
+    if content is None or author is None or author.get("bot"):
+        return  # Embed-only update, or not a user's report
+
+    castle_round = message_round(guild, payload.message_id)
+    if castle_round is None:
+        return  # Its round is over, the result stands
+    floor, boss_name = parse_report(content)
+    if castle_round.counted_report(payload.message_id) == (floor, boss_name):
+        return  # Still the same report, e.g. a typo fixed elsewhere in the message
+
+    changed = retract_vote(guild, castle_round, payload.message_id)
+    if floor and boss_name:
+        # Counts from when it was posted, in between the reports around it
+        posted_at = discord.utils.snowflake_time(payload.message_id)
+        changed = record_vote(guild, floor, boss_name, int(author["id"]), posted_at, payload.message_id) or changed
+    if changed:
+        mark_report_dirty(guild, clock.now())
 
-        # Track reports per floor
-        boss_data = reported_bosses[floor]
-        boss_data["reports"][boss_name] = boss_data["reports"].get(boss_name, 0) + 1
+@bot.event
+@profiled("on_raw_message_delete")
+async def on_raw_message_delete(payload):
+    """Withdraws the vote a deleted boss report cast."""
+    await retract_deleted(payload.channel_id, [payload.message_id])
 
-        # If only one report exists, set it as current boss
-        if len(boss_data["reports"]) == 1:
-            boss_data["current_boss"] = (boss_name, emoji)
-            enhanced_print(f"Floor {floor}: First report for {boss_name}")
+@bot.event
+@profiled("on_raw_bulk_message_delete")
+async def on_raw_bulk_message_delete(payload):
+    """Withdraws the votes of bulk-deleted boss reports, with one report refresh."""
+    await retract_deleted(payload.channel_id, payload.message_ids)
+
+async def retract_deleted(channel_id, message_ids):
+    """Withdraws the reports of deleted messages in a source channel and refreshes the report once if that changed it."""
+    guild = channel_guilds.get(channel_id)
+    if guild is None or channel_id not in guild.source_channel_ids:
+        return
+    changed = False
+    for message_id in message_ids:
+        castle_round = message_round(guild, message_id)
+        if castle_round is not None:
+            changed = retract_vote(guild, castle_round, message_id) or changed
+    if changed:
+        mark_report_dirty(guild, clock.now())
+
+@profiled("apply_ingest_batch")
+async def apply_ingest_batch(batch):
+    """Parses a batch of (guild, message), applies the votes and marks each changed guild's report once."""
+    changed = {}  # GuildState -> creation time of its first vote that changed a floor
+    late_tallies = {}  # GuildState -> tallies a late report left owing a recount, settled once per batch
+    alerts = {}  # (GuildState, floor) -> None, one Monarch alert per floor however often the batch reports it
+    for guild, message in batch:
+        enhanced_print(f"Received message from {message.channel.id}: {message.content}", level="debug")
+
+        metric_counts["messages_parsed"] += 1
+        floor, boss_name = parse_report(message.content)
+        if not (boss_name and floor):
+            continue
 
-        # If 3 or more people report the same boss, update to that boss
-        elif boss_data["reports"][boss_name] >= 3:
-            # Only update if it's different from current boss
-            current_boss_name = boss_data["current_boss"][0] if boss_data["current_boss"] else None
-            if current_boss_name != boss_name:
-                boss_data["current_boss"] = (boss_name, emoji)
-                enhanced_print(f"Floor {floor}: Changed to {boss_name} (3+ reports: {boss_data['reports'][boss_name]})")
-            else:
-                enhanced_print(f"Floor {floor}: Confirmed {boss_name} (reports: {boss_data['reports'][boss_name]})")
+        metric_counts["boss_reports"] += 1
+        enhanced_print(f"[{guild.name}] Detected Floor: {floor}, Boss: {boss_name}")
 
-        # If multiple bosses reported but none have 3+ reports, keep current boss
-        else:
-            enhanced_print(f"Floor {floor}: Multiple reports but no boss has 3+ yet: {boss_data['reports']}")
+        if record_vote(guild, floor, boss_name, message.author.id, message.created_at, message.id,
+                       late_tallies.setdefault(guild, set())):
+            changed.setdefault(guild, message.created_at)
 
         # Send separate Monarch alert message
         if boss_name.upper() == "MONARCH":
-            await send_monarch_alert(floor)
+            alerts[(guild, floor)] = None
+
+    for guild, tallies in late_tallies.items():
+        for tally in tallies:
+            previous_boss = tally.current_boss
+            tally.settle()
+            if tally.current_boss != previous_boss:
+                changed.setdefault(guild, batch[0][1].created_at)
+    for guild, changed_at in changed.items():
+        mark_report_dirty(guild, changed_at)
+    for guild, floor in alerts:
+        await send_monarch_alert(guild, floor)
+
+async def ingest_worker():
+    """Takes up to INGEST_BATCH_SIZE queued messages at a time and applies them."""
+    while True:
+        batch = [await ingest_queue.get()]
+        while len(batch) < INGEST_BATCH_SIZE and not ingest_queue.empty():
+            batch.append(ingest_queue.get_nowait())
+
+        metric_counts["ingest_batches"] += 1
+        try:
+            await apply_ingest_batch(batch)
+        except Exception as e:
+            enhanced_print(f"Ingest worker error: {e}", level="error")
+        finally:
+            for _ in batch:
+                ingest_queue.task_done()
+
+        # Once the burst is over, read whatever was dropped back from channel history
+        if ingest_rescans and ingest_queue.empty():
+            for guild_id in list(ingest_rescans):
+                ingest_rescans.discard(guild_id)
+                guild = guilds.get(guild_id)
+                if guild:
+                    try:
+                        await scan_recent_messages_for_bosses(guild)
+                    except Exception as e:
+                        enhanced_print(f"[{guild.name}] Rescan after dropped reports failed: {e}", level="error")
 
-# Store floors for which SJW alerts have already been sent
-notified_floors = set()
+def start_ingest_workers():
+    """Starts the ingest queue and its workers once, even if on_ready fires again after a reconnect."""
+    global ingest_queue
 
-async def send_monarch_alert(floor):
-    """Sends a separate alert message when Monarch is spotted."""
-    global notified_floors  # Reference the set defined above
-    target_channel = bot.get_channel(TARGET_CHANNEL_ID)
+    if ingest_worker_tasks and not all(task.done() for task in ingest_worker_tasks):
+        return
+    ingest_queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    ingest_worker_tasks[:] = [asyncio.create_task(ingest_worker()) for _ in range(INGEST_WORKERS)]
+
+async def send_monarch_alert(guild, floor):
+    """Sends a separate alert message when Monarch is spotted, once per floor and round."""
+    castle_round = current_round(guild)
+    target_channel = get_channel(guild.target_channel_id)
+
+    if floor not in castle_round.notified and target_channel:
+        # Mark this floor as notified before awaiting the send, so a concurrent worker doesn't ping again
+        castle_round.notified.add(floor)
+        journal("notified", guild=guild.guild_id, hour=castle_round.hour.isoformat(), floor=floor)
+        monarch_alert = f"<@&{guild.sjw_role_id}> 👑 **MONARCH SPOTTED ON FLOOR {floor}!** 👑"
+        try:
+            await outbound("alert", "monarch_alert", "send", target_channel, lambda: target_channel.send(monarch_alert))
+        except Exception as e:
+            castle_round.notified.discard(floor)  # Not sent, the next Monarch report may try again
+            journal("unnotified", guild=guild.guild_id, hour=castle_round.hour.isoformat(), floor=floor)
+            enhanced_print(f"[{guild.name}] Failed to send Monarch alert for floor {floor}: {e}", level="error")
 
-    if floor not in notified_floors and target_channel:
-        monarch_alert = f"<@&{SJW_ROLE_ID}> 👑 **MONARCH SPOTTED ON FLOOR {floor}!** 👑"
-        await target_channel.send(monarch_alert)
-        notified_floors.add(floor)  # Mark this floor as notified
+def command_response_channel(ctx, guild):
+    """Returns the guild's command response channel, or the channel the command came from."""
+    if guild is None:
+        return ctx.channel
+    return get_channel(guild.command_response_channel_id) or ctx.channel  # Fallback to current channel
 
 @bot.command(name="edit_message")
 async def edit_message_command(ctx, floor_boss_input: str = None):
     """Manually edit a specific floor's boss in the report. Usage: !edit_message F70 Frioo or !edit F45 Gucci"""
-    global latest_message_id, latest_message_timestamp, reported_bosses
     
     enhanced_print(f"Edit message command received from {ctx.author} in channel {ctx.channel.id}")
     
     # Get command response channel
-    response_channel = bot.get_channel(COMMAND_RESPONSE_CHANNEL_ID)
-    if not response_channel:
-        response_channel = ctx.channel  # Fallback to current channel
+    guild = channel_guilds.get(ctx.channel.id)
+    response_channel = command_response_channel(ctx, guild)
     
-    if ctx.channel.id not in SOURCE_CHANNEL_IDS and ctx.channel.id != TARGET_CHANNEL_ID:
-        await response_channel.send("❌ This command can only be used in designated channels.")
+    if guild is None:
+        await send_reply(response_channel, "❌ This command can only be used in designated channels.")
         return
     
     if not floor_boss_input:
-        await response_channel.send("❌ Please specify floor and boss. Example: `!edit_message F70 Frioo` or `!edit F45 Gucci`")
+        await send_reply(response_channel, "❌ Please specify floor and boss. Example: `!edit_message F70 Frioo` or `!edit F45 Gucci`")
         return
     
     # Parse the input (e.g., "F70 Frioo" or "45 Gucci")
     parts = floor_boss_input.strip().split(None, 1)  # Split into max 2 parts
     if len(parts) != 2:
-        await response_channel.send("❌ Invalid format. Use: `!edit_message F70 Frioo` or `!edit F45 Gucci`")
+        await send_reply(response_channel, "❌ Invalid format. Use: `!edit_message F70 Frioo` or `!edit F45 Gucci`")
         return
     
     floor_part, boss_part = parts
@@ -348,89 +2042,68 @@ async def edit_message_command(ctx, floor_boss_input: str = None):
     # Extract floor number
     floor_match = re.search(r"(\d{2})", floor_part)
     if not floor_match:
-        await response_channel.send("❌ Invalid floor format. Use F70, 70, Floor70, etc.")
+        await send_reply(response_channel, "❌ Invalid floor format. Use F70, 70, Floor70, etc.")
         return
     
     floor = floor_match.group(1)
-    if floor not in VALID_FLOORS:
-        await response_channel.send(f"❌ Invalid floor. Valid floors are: {', '.join(sorted(VALID_FLOORS, key=int))}")
+    snapshot = catalog
+    if floor not in snapshot.valid_floors:
+        await send_reply(response_channel, f"❌ Invalid floor. Valid floors are: {', '.join(snapshot.floor_order)}")
         return
     
     # Find boss name from aliases
     boss_name = None
     boss_part_lower = boss_part.lower().strip()
-    
-    for boss, aliases in BOSS_ALIASES.items():
-        for alias in aliases:
-            if boss_part_lower == alias.lower():
-                boss_name = boss.upper()
-                break
-        if boss_name:
-            break
+    if boss_part_lower in snapshot.alias_lookup:
+        boss_name = snapshot.alias_lookup[boss_part_lower][1]
     
     if not boss_name:
-        await response_channel.send(f"❌ Unknown boss '{boss_part}'. Check spelling or available bosses.")
+        suggestion = closest_boss(boss_part_lower)
+        if suggestion:
+            await send_reply(response_channel, f"❌ Unknown boss '{boss_part}'. Did you mean **{suggestion}**? Try `!edit {floor} {suggestion.lower()}`")
+        else:
+            await send_reply(response_channel, f"❌ Unknown boss '{boss_part}'. Check spelling or available bosses.")
         return
     
     # Get emoji for the boss
-    emoji = BOSS_EMOJIS.get(boss_name.lower(), "")
-    
-    # Update the stored boss data
-    boss_data = reported_bosses[floor]
-    boss_data["current_boss"] = (boss_name, emoji)
-    boss_data["reports"] = {boss_name: 1}  # Reset reports to show this boss as confirmed
-    
-    enhanced_print(f"Manual edit: Floor {floor} set to {boss_name}")
+    emoji = snapshot.emoji(boss_name)
     
-    # Try to update the latest report message
-    target_channel = bot.get_channel(TARGET_CHANNEL_ID)
-    if not target_channel:
-        await response_channel.send("❌ Target channel not found.")
+    # Update the stored boss data, earlier votes no longer count
+    castle_round = current_round(guild)
+    tally = castle_round.tally(floor)
+    if tally is None:
+        await send_reply(response_channel, f"❌ Floor {floor} was added after this round started, it's part of the next report.")
         return
+    tally.set_boss(boss_name)
+    mark_report_dirty(guild)
+    journal("set_boss", guild=guild.guild_id, hour=castle_round.hour.isoformat(), floor=floor, boss=boss_name)
+    
+    enhanced_print(f"[{guild.name}] Manual edit: Floor {floor} set to {boss_name}")
     
     updated = False
     
-    # Try to edit the latest message if it exists
-    if latest_message_id:
+    # Edit the latest report through its stored handle, no channel history needed
+    report = latest_report(guild)
+    if report:
         try:
-            msg = await target_channel.fetch_message(latest_message_id)
-            await msg.edit(content=await build_report_content())
+            await edit_report(guild, report, await build_report_content(guild), "!edit")
             updated = True
-            enhanced_print(f"Manual edit: Updated existing report (ID: {latest_message_id})")
+            enhanced_print(f"[{guild.name}] Manual edit: Updated existing report (ID: {report.id})")
         except discord.NotFound:
-            enhanced_print("Manual edit: Latest message not found")
+            enhanced_print(f"[{guild.name}] Manual edit: Latest message not found")
+            forget_report(guild, report.id)
         except discord.HTTPException as e:
-            enhanced_print(f"Manual edit: Failed to edit message: {e}")
-    
-    # If no latest message or edit failed, try to find and update recent reports
-    if not updated:
-        now = datetime.utcnow() + timedelta(hours=2)
-        cutoff_time = now - timedelta(minutes=30)  # Look for reports in last 30 minutes
-        
-        try:
-            async for message in target_channel.history(limit=50, after=cutoff_time):
-                if message.author == bot.user and "INFERNAL CASTLE SPAWNED" in message.content:
-                    try:
-                        await message.edit(content=await build_report_content())
-                        latest_message_id = message.id
-                        latest_message_timestamp = message.created_at.replace(tzinfo=None) + timedelta(hours=2)
-                        updated = True
-                        enhanced_print(f"Manual edit: Updated recent report (ID: {message.id})")
-                        break
-                    except discord.HTTPException as e:
-                        enhanced_print(f"Manual edit: Failed to edit message {message.id}: {e}")
-        except Exception as e:
-            enhanced_print(f"Manual edit: Error scanning for recent reports: {e}")
+            enhanced_print(f"Manual edit: Failed to edit message: {e}", level="error")
     
     # Send confirmation
     if updated:
-        await response_channel.send(f"✅ **Floor {floor}** has been manually set to **{emoji} {boss_name}** and report updated!")
+        await send_reply(response_channel, f"✅ **Floor {floor}** has been manually set to **{emoji} {boss_name}** and report updated!")
         
         # Send separate Monarch alert if needed
         if boss_name.upper() == "MONARCH":
-            await send_monarch_alert(floor)
+            await send_monarch_alert(guild, floor)
     else:
-        await response_channel.send(f"✅ **Floor {floor}** has been set to **{emoji} {boss_name}** but no recent report found to update. Data will be used in next report.")
+        await send_reply(response_channel, f"✅ **Floor {floor}** has been set to **{emoji} {boss_name}** but no recent report found to update. Data will be used in next report.")
 
 @bot.command(name="edit")
 async def edit_command(ctx, *, floor_boss_input: str = None):
@@ -440,81 +2113,252 @@ async def edit_command(ctx, *, floor_boss_input: str = None):
 @bot.command(name="force_update")
 async def force_update_command(ctx):
     """Manually force an update of the boss report by scanning recent messages and updating all recent reports."""
-    global latest_message_id, latest_message_timestamp, reported_bosses
     
     enhanced_print(f"Force update command received from {ctx.author} in channel {ctx.channel.id}")
     
     # Get command response channel
-    response_channel = bot.get_channel(COMMAND_RESPONSE_CHANNEL_ID)
-    if not response_channel:
-        response_channel = ctx.channel  # Fallback to current channel
+    guild = channel_guilds.get(ctx.channel.id)
+    response_channel = command_response_channel(ctx, guild)
     
-    if ctx.channel.id in SOURCE_CHANNEL_IDS or ctx.channel.id == TARGET_CHANNEL_ID:
-        target_channel = bot.get_channel(TARGET_CHANNEL_ID)
+    if guild is not None:
+        target_channel = get_channel(guild.target_channel_id)
         if not target_channel:
-            await response_channel.send("❌ Target channel not found.")
+            await send_reply(response_channel, "❌ Target channel not found.")
             return
 
         # Clear existing boss data and rebuild from recent messages
-        reported_bosses.clear()
-        enhanced_print("Force update: Scanning source channels for recent boss reports...")
+        castle_round = current_round(guild)
+        castle_round.reset()
+        mark_report_dirty(guild)
+        guild.backfill_watermarks.clear()  # Full rescan of the window
+        journal("clear", guild=guild.guild_id, hour=castle_round.hour.isoformat())
+        enhanced_print(f"[{guild.name}] Force update: Scanning source channels for recent boss reports...")
         
         # Scan both source channels for the last 10 minutes
-        await scan_recent_messages_for_bosses()
+        await scan_recent_messages_for_bosses(guild)
         
-        # Find all bot reports from the last 50 minutes and update them
-        now = datetime.utcnow() + timedelta(hours=2)
-        cutoff_time = now - timedelta(minutes=50)
-        updated_count = 0
+        # Update every report the bot posted in the last 50 minutes, rendered once and edited concurrently
+        cutoff_time = clock.now() - timedelta(minutes=50)
+        reports = [report for report in guild.report_messages.values() if report.created_at >= cutoff_time]
         
-        enhanced_print("Force update: Looking for recent bot reports to update...")
-        try:
-            async for message in target_channel.history(limit=100, after=cutoff_time):
-                if message.author == bot.user and "INFERNAL CASTLE SPAWNED" in message.content:
-                    try:
-                        await message.edit(content=await build_report_content())
-                        updated_count += 1
-                        enhanced_print(f"Force update: Updated report (ID: {message.id})")
-                        
-                        # Update the latest_message_id to the most recent one
-                        if not latest_message_id or message.created_at > latest_message_timestamp:
-                            latest_message_id = message.id
-                            latest_message_timestamp = message.created_at.replace(tzinfo=None) + timedelta(hours=2)
-                            
-                    except discord.HTTPException as e:
-                        enhanced_print(f"Force update: Failed to edit message {message.id}: {e}")
-        except Exception as e:
-            enhanced_print(f"Force update: Error scanning target channel: {e}")
+        enhanced_print(f"[{guild.name}] Force update: Updating {len(reports)} recent bot report(s)...")
+        results = await bulk_edit_reports(guild, reports, await build_report_content(guild), "!force_update")
+        updated_count = sum(result in ("updated", "unchanged") for result in results.values())
         
         if updated_count > 0:
-            await response_channel.send(f"✅ Force update complete! Updated {updated_count} recent report(s) with latest boss data.")
+            summary = "\n".join(f"`{message_id}` {result}" for message_id, result in results.items())
+            await send_reply(response_channel, f"✅ Force update complete! Updated {updated_count} recent report(s) with latest boss data.\n{summary}"[:2000])
         else:
             # If no recent reports found, post a new one
-            await post_report()
-            await response_channel.send("✅ No recent reports found. Posted new report with latest data!")
+            await post_report(guild)
+            await send_reply(response_channel, "✅ No recent reports found. Posted new report with latest data!")
+    else:
+        await send_reply(response_channel, "❌ This command can only be used in designated channels.")
+
+@bot.command(name="history")
+async def history_command(ctx, count: str = None):
+    """Shows the bosses of the last castle rounds from memory. Usage: !history or !history 5"""
+    enhanced_print(f"History command received from {ctx.author}")
+    guild = channel_guilds.get(ctx.channel.id)
+    response_channel = command_response_channel(ctx, guild)
+    if guild is None:
+        await send_reply(response_channel, "❌ This command can only be used in designated channels.")
+        return
+
+    if count is None:
+        count = HISTORY_DEFAULT_ROUNDS
+    elif count.isdigit() and 1 <= int(count) <= HISTORY_MAX_ROUNDS:
+        count = int(count)
     else:
-        await response_channel.send("❌ This command can only be used in designated channels.")
+        await send_reply(response_channel, f"❌ Use `!history` or `!history <1-{HISTORY_MAX_ROUNDS}>`.")
+        return
+
+    live_hour = report_hour_key(clock.now())
+    lines = []
+    for castle_round in guild.rounds.recent(count):
+        local_hour = castle_round.hour.astimezone(clock.tz)
+        label = f"**{local_hour.strftime('%d %b %H')}:{REPORT_POST_MINUTE}**"
+        if castle_round.hour == live_hour:
+            label += " *(live)*"
+        floors = [
+            f"F{floor} {catalog.emoji(boss_name)} {boss_name}"
+            for floor, boss_name in castle_round.bosses() if boss_name
+        ]
+        lines.append(f"{label} - " + (" · ".join(floors) if floors else "*no reports*"))
+
+    if not lines:
+        await send_reply(response_channel, "No castle rounds recorded yet.")
+        return
+    await send_reply(response_channel, "\n".join(lines)[:2000])
+
+@bot.command(name="spawnstats")
+async def spawnstats_command(ctx, floor: str = None):
+    """Shows how often each boss spawned, from the archived rounds. Usage: !spawnstats or !spawnstats 70"""
+    enhanced_print(f"Spawnstats command received from {ctx.author}")
+    guild = channel_guilds.get(ctx.channel.id)
+    response_channel = command_response_channel(ctx, guild)
+    if guild is None:
+        await send_reply(response_channel, "❌ This command can only be used in designated channels.")
+        return
+
+    # Read straight off the aggregates, the cost depends on the catalog size and not on how much history there is
+    rounds = spawn_rounds[guild.guild_id]
+    floors = spawn_counts.get(guild.guild_id, {})
+    if not rounds:
+        await send_reply(response_channel, "No finished rounds archived yet.")
+        return
+
+    if floor is None:
+        lines = [f"**Spawn stats** over {rounds} round(s)"]
+        monarch = 0
+        for floor_key in sorted(floors, key=int):
+            totals = {boss: sum(hours) for boss, hours in floors[floor_key].items()}
+            total = sum(totals.values())
+            monarch += totals.get("MONARCH", 0)
+            top = sorted(totals.items(), key=lambda item: -item[1])[:3]
+            lines.append(f"**F{floor_key}** " + " · ".join(
+                f"{catalog.emoji(boss)} {boss} {count * 100 // total}%" for boss, count in top))
+        lines.append(f"👑 Monarch: {monarch} sighting(s), {monarch / rounds:.2f} per round")
+        await send_reply(response_channel, "\n".join(lines)[:2000])
+        return
+
+    floor_match = re.search(r"(\d{2})", floor)
+    if not floor_match or floor_match.group(1) not in floors:
+        await send_reply(response_channel, f"❌ No archived results for floor {floor}. Use `!spawnstats` or `!spawnstats 70`.")
+        return
+
+    floor = floor_match.group(1)
+    totals = sorted(((sum(hours), boss, hours) for boss, hours in floors[floor].items()), reverse=True)
+    total = sum(count for count, _, _ in totals)
+    lines = [f"**Floor {floor} spawns** over {total} round(s)"]
+    for count, boss, hours in totals:
+        peak = max(range(24), key=hours.__getitem__)
+        lines.append(f"{catalog.emoji(boss)} **{boss}** {count} ({count * 100 // total}%) · most often at {peak:02d}:{REPORT_POST_MINUTE}")
+    await send_reply(response_channel, "\n".join(lines)[:2000])
+
+@bot.command(name="reload")
+async def reload_command(ctx):
+    """Reloads the boss, alias, emoji and floor catalog from its file, bot owner only. Usage: !reload"""
+    enhanced_print(f"Reload command received from {ctx.author}")
+    guild = channel_guilds.get(ctx.channel.id)
+    response_channel = command_response_channel(ctx, guild)
+    # The catalog is shared by every guild the bot serves, so no single guild's member gets to swap it
+    if not await bot.is_owner(ctx.author):
+        await send_reply(response_channel, "❌ Only the bot's owner can reload the catalog.")
+        return
+    if guild is None:
+        await send_reply(response_channel, "❌ This command can only be used in designated channels.")
+        return
+
+    try:
+        snapshot = reload_catalog()
+    except Exception as e:
+        enhanced_print(f"Catalog reload failed, keeping the current catalog: {e}", level="error")
+        await send_reply(response_channel, f"❌ Catalog not reloaded, the current one stays: {e}"[:2000])
+        return
+    await send_reply(response_channel, f"✅ Catalog reloaded: {snapshot.summary()}. New floors show from the next report.")
+
+@bot.command(name="profile")
+async def profile_command(ctx, action: str = None):
+    """Starts or stops a profiling session, bot owner only. Usage: !profile start or !profile stop"""
+    enhanced_print(f"Profile command received from {ctx.author}")
+    response_channel = command_response_channel(ctx, channel_guilds.get(ctx.channel.id))
+    # Profiling slows down and writes files for the whole process, every guild it serves, so no single guild's admin gets it
+    if not await bot.is_owner(ctx.author):
+        await send_reply(response_channel, "❌ Only the bot's owner can profile the bot.")
+        return
+
+    if action == "start":
+        if start_profiling():
+            await send_reply(response_channel, "✅ Profiling started. Use `!profile stop` to write the summary.")
+        else:
+            await send_reply(response_channel, "❌ Profiling is already running.")
+    elif action == "stop":
+        path = stop_profiling()
+        if path:
+            await send_reply(response_channel, f"✅ Profiling stopped, summary written to `{path}`.")
+        else:
+            await send_reply(response_channel, "❌ Profiling isn't running.")
+    else:
+        await send_reply(response_channel, "❌ Use `!profile start` or `!profile stop`.")
+
+@bot.before_invoke
+async def attribute_command_calls(ctx):
+    """Books the HTTP responses a command triggers against that command."""
+    metric_counts["commands"] += 1
+    api_call_site.set(f"!{ctx.command.name}")
+    if profiler is not None:
+        ctx.profile_started = time.perf_counter()
+
+@bot.after_invoke
+async def profile_command_calls(ctx):
+    """Records a command's wall time while a profiling session runs."""
+    started = getattr(ctx, "profile_started", None)
+    if profiler is not None and started is not None:
+        profiler.record(f"!{ctx.command.name}", time.perf_counter() - started)
+
+@bot.command(name="stats")
+async def stats_command(ctx):
+    """Shows message, latency and Discord API counters since startup. Usage: !stats"""
+    enhanced_print(f"Stats command received from {ctx.author}")
+    response_channel = command_response_channel(ctx, channel_guilds.get(ctx.channel.id))
+
+    def bound(histogram, q):
+        value = histogram.quantile(q)
+        if value is None:
+            return "-"
+        if value == float("inf"):
+            return f">{histogram.bounds[-1]}s"
+        return f"≤{value}s"
+
+    uptime = timedelta(seconds=int(time.monotonic() - metrics_started))
+    rate_limited = sum(count for (_, status), count in http_responses.items() if status == 429)
+    lines = [
+        f"**Bot stats** (up {uptime})",
+        f"Messages: {metric_counts['messages_ingested']} ingested · {metric_counts['messages_parsed']} parsed · "
+        f"{metric_counts['boss_reports']} boss reports",
+        f"Message → report: {propagation_latency.count} change(s) · p50 {bound(propagation_latency, 0.5)} · "
+        f"p90 {bound(propagation_latency, 0.9)} · p99 {bound(propagation_latency, 0.99)}",
+        f"Ingest: {metric_counts['ingest_batches']} batches · {metric_counts['ingest_dropped']} dropped · "
+        f"{ingest_queue.qsize() if ingest_queue else 0} queued",
+        f"Rate limited (429): {rate_limited} · HTTP errors: {sum(api_errors.values())}",
+    ]
+    lanes = [
+        f"{lane} {len(queue)} queued, p99 wait {bound(histogram, 0.99)}"
+        + (f", {outbound_coalesced[lane]} coalesced" if outbound_coalesced[lane] else "")
+        + (f", {outbound_dropped[lane]} dropped" if outbound_dropped[lane] else "")
+        for lane, queue, histogram in zip(OUTBOUND_LANES, outbound_lanes, outbound_wait)
+    ]
+    lines.append("Outbound: " + " · ".join(lanes))
+
+    sites = {}
+    for (site, kind), count in sorted(api_calls.items()):
+        sites.setdefault(site, []).append(f"{kind} {count}")
+    for site, calls in sites.items():
+        lines.append(f"`{site}` " + " · ".join(calls))
+
+    await send_reply(response_channel, "\n".join(lines)[:2000])
 
 @bot.command(name="botuptime")
 async def uptime_command(ctx):
     """Provides a link for UptimeRobot to ping."""
     enhanced_print(f"Uptime command received from {ctx.author}")
-    response_channel = bot.get_channel(COMMAND_RESPONSE_CHANNEL_ID) or ctx.channel
+    response_channel = command_response_channel(ctx, channel_guilds.get(ctx.channel.id))
     replit_url = "https://replit.com/@abdolotte7/Spidy-Castle-Bot"
-    await response_channel.send(f"Ping this link with UptimeRobot: {replit_url}")
+    await send_reply(response_channel, f"Ping this link with UptimeRobot: {replit_url}")
 
 @bot.command(name="test")
 async def test_command(ctx):
     """Test command to check if bot is responding."""
     enhanced_print(f"Test command received from {ctx.author}")
-    response_channel = bot.get_channel(COMMAND_RESPONSE_CHANNEL_ID) or ctx.channel
-    await response_channel.send("✅ Bot is working! Commands are functional.")
+    response_channel = command_response_channel(ctx, channel_guilds.get(ctx.channel.id))
+    await send_reply(response_channel, "✅ Bot is working! Commands are functional.")
 
 @bot.command(name="permissions")
 async def check_permissions(ctx):
     """Check bot permissions in current channel."""
     enhanced_print(f"Permission check requested by {ctx.author}")
-    response_channel = bot.get_channel(COMMAND_RESPONSE_CHANNEL_ID) or ctx.channel
+    response_channel = command_response_channel(ctx, channel_guilds.get(ctx.channel.id))
     perms = ctx.channel.permissions_for(ctx.guild.me)
     perm_list = []
 
@@ -533,37 +2377,275 @@ async def check_permissions(ctx):
     else:
         perm_list.append("❌ Embed Links")
 
-    await response_channel.send(f"**Bot Permissions:**\n" + "\n".join(perm_list))
+    await send_reply(response_channel, f"**Bot Permissions:**\n" + "\n".join(perm_list))
 
-def extract_boss_name(message_content):
-    """Extracts boss name from message using aliases."""
-    message_lower = message_content.lower()
-    message_cleaned = re.sub(r"(?:f|floor)?\s*\d{2}(?:\s*f|floor|:)?", "", message_lower).strip()
+# Floor token as users type it ("F70", "floor 45", "55:", "70f"), shared by the floor and boss parsers. A trailing
+# "f" only belongs to the floor when it stands alone, so "70 frioo" keeps its boss
+FLOOR_PATTERN = re.compile(r"(?:f|floor)?\s*(\d{2})(?:\s*f\b|floor|:)?")
+TWO_DIGITS = re.compile(r"\d{2}")  # Every floor token has these, on_message's pre-filter
 
-    for boss, aliases in BOSS_ALIASES.items():
+def build_alias_matcher(boss_aliases):
+    """Compiles every alias into one longest-first alternation and an alias -> (priority, boss) lookup."""
+    alias_lookup = {}
+    for priority, (boss, aliases) in enumerate(boss_aliases.items()):
         for alias in aliases:
-            if re.search(rf"\b{alias}\b", message_cleaned):  # ✅ Match exact words or attached boss names
-                return boss.upper()
+            alias_lookup.setdefault(alias.lower(), (priority, boss.upper()))
+
+    # Longest first so "god speed" wins over "god" and "chainsaw man" over "chainsaw"
+    ordered_aliases = sorted(alias_lookup, key=len, reverse=True)
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(alias) for alias in ordered_aliases) + r")\b")
+    return pattern, alias_lookup
+
+# Misspelt aliases ("vermilion", "chainsw") are looked up in a symmetric deletion index: every alias is stored
+# under each string left after deleting a few of its characters, so a typo and its alias meet on a shared key
+WORD_PATTERN = re.compile(r"[a-z]+(?:-[a-z]+)*")
+
+def fuzzy_max_distance(length):
+    """Edits tolerated for an alias of this length."""
+    return 1 if length < 8 else 2
+
+def deletions(word, depth):
+    """Returns word and every string left after deleting up to depth of its characters."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+def edit_distance(a, b, limit):
+    """Edit distance where swapping two neighbours counts as one edit, limit + 1 once it's known to be above limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                value = min(value, before_previous[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+def build_fuzzy_index(alias_lookup):
+    """Maps each deletion variant of the aliases long enough for fuzzy matching to the aliases it came from."""
+    index = {}
+    for alias in alias_lookup:
+        if len(alias) >= FUZZY_MIN_LENGTH:
+            for variant in deletions(alias, fuzzy_max_distance(len(alias))):
+                index.setdefault(variant, []).append(alias)
+    return index
+
+def fuzzy_token(snapshot, token):
+    """Returns ((boss, distance, priority), ...) for every boss with an alias within reach of token. Called through
+    the snapshot's cache, chat repeats itself a lot so most tokens come straight from there."""
+    if not FUZZY_MIN_LENGTH <= len(token) <= snapshot.fuzzy_max_token_length:
+        return ()
+
+    # Two edits are only confident on aliases of 10+ characters, so shorter tokens need one deletion level
+    candidates = set()
+    for variant in deletions(token, 2 if len(token) >= 8 else 1):
+        candidates.update(snapshot.fuzzy_index.get(variant, ()))
+
+    matches = {}
+    for alias in candidates:
+        if alias.count(" ") != token.count(" "):
+            continue  # Words only match one-word aliases and pairs two-word ones, so "chain" isn't "cha in" minus a space
+        allowed = fuzzy_max_distance(len(alias))
+        distance = edit_distance(token, alias, allowed)
+        if distance > allowed or 1 - distance / len(alias) < FUZZY_MIN_CONFIDENCE:
+            continue
+        priority, boss = snapshot.alias_lookup[alias]
+        if boss not in matches or (distance, priority) < matches[boss]:
+            matches[boss] = (distance, priority)
+    return tuple((boss, distance, priority) for boss, (distance, priority) in matches.items())
+
+def fuzzy_boss(snapshot, message_cleaned):
+    """Returns the boss a misspelt alias in the text stands for, None unless exactly one boss is a confident match."""
+    words = WORD_PATTERN.findall(message_cleaned)
+    tokens = words + [f"{first} {second}" for first, second in zip(words, words[1:])]  # For two-word aliases
+
+    best = {}  # Boss -> (distance, priority) of its closest alias
+    for token in tokens:
+        for boss, distance, priority in snapshot.fuzzy_token(token):
+            if boss not in best or (distance, priority) < best[boss]:
+                best[boss] = (distance, priority)
+
+    if not best:
+        return None
+    ranked = sorted(best.items(), key=lambda item: item[1])
+    if len(ranked) > 1 and ranked[0][1][0] == ranked[1][1][0]:
+        return None  # Two bosses equally close, not confident either way
+    return ranked[0][0]
+
+class Catalog:
+    """Immutable snapshot of the bosses, aliases, emojis and floors plus everything precompiled from them. A reload
+    builds a whole new one and swaps it in with one assignment, so a parse never sees half of each."""
+
+    __slots__ = ("boss_aliases", "emojis", "valid_floors", "floor_order", "alias_pattern", "alias_lookup",
+                 "fuzzy_index", "fuzzy_max_token_length", "fuzzy_token")
+
+    def __init__(self, boss_aliases, boss_emojis, floors):
+        floors = [str(floor) for floor in floors]
+        bad_floors = [floor for floor in floors if not (len(floor) == 2 and floor.isdigit())]
+        if bad_floors or not floors:
+            raise ValueError(f"Floors must be two-digit numbers, got {bad_floors or 'none'}")
+        empty = [boss for boss, aliases in boss_aliases.items()
+                 if isinstance(aliases, str) or not aliases or not all(alias.strip() for alias in aliases)]
+        if empty or not boss_aliases:
+            raise ValueError(f"Every boss needs non-empty aliases, check {empty or 'the boss list'}")
+
+        self.boss_aliases = {boss: tuple(aliases) for boss, aliases in boss_aliases.items()}  # In priority order
+        self.emojis = {boss.upper(): emoji for boss, emoji in boss_emojis.items()}  # Keyed like the parsed boss names
+        self.valid_floors = frozenset(floors)
+        self.floor_order = tuple(sorted(self.valid_floors, key=int))  # Floors in report order
+        self.alias_pattern, self.alias_lookup = build_alias_matcher(self.boss_aliases)
+        self.fuzzy_index = build_fuzzy_index(self.alias_lookup)
+        self.fuzzy_max_token_length = max(map(len, self.alias_lookup)) + 2  # Anything longer is more than two edits from every alias
+        # Cached per snapshot, so a reload never serves matches against the old aliases
+        self.fuzzy_token = functools.lru_cache(maxsize=FUZZY_CACHE_SIZE)(functools.partial(fuzzy_token, self))
+
+    def emoji(self, boss_name):
+        return self.emojis.get(boss_name.upper(), "")
+
+    def summary(self):
+        return f"{len(self.boss_aliases)} bosses, {len(self.alias_lookup)} aliases, {len(self.floor_order)} floors"
+
+def load_catalog(path):
+    """Builds a Catalog from the JSON catalog file, or from the built-in tables if there is no file."""
+    if not os.path.exists(path):
+        return Catalog(BOSS_ALIASES, BOSS_EMOJIS, VALID_FLOORS)
+    with open(path, encoding="utf-8") as catalog_file:
+        data = json.load(catalog_file)
+    bosses = data["bosses"]  # Boss -> {"aliases": [...], "emoji": "..."}, listed first wins when a message names several
+    return Catalog(
+        {boss: entry["aliases"] for boss, entry in bosses.items()},
+        {boss: entry["emoji"] for boss, entry in bosses.items() if entry.get("emoji")},
+        data["floors"],
+    )
+
+def catalog_mtime(path):
+    """Returns the catalog file's modification time, None if there is no file."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+catalog_loaded_mtime = catalog_mtime(CATALOG_PATH)
+catalog = load_catalog(CATALOG_PATH)
+catalog_watcher_task = None
+
+def reload_catalog():
+    """Loads the catalog file into a new snapshot and swaps it in, returns the snapshot. On any error the old one stays."""
+    global catalog, catalog_loaded_mtime
+
+    mtime = catalog_mtime(CATALOG_PATH)
+    snapshot = load_catalog(CATALOG_PATH)  # Everything is compiled before the swap
+    catalog = snapshot  # ✅ One assignment, parses already holding the old snapshot finish on it
+    catalog_loaded_mtime = mtime
+    metric_counts["catalog_reloads"] += 1
+    enhanced_print(f"Catalog reloaded from {CATALOG_PATH}: {snapshot.summary()}")
+    return snapshot
+
+async def catalog_watcher():
+    """Reloads the catalog whenever its file changes."""
+    global catalog_loaded_mtime
+
+    while True:
+        await asyncio.sleep(CATALOG_WATCH_INTERVAL)
+        mtime = catalog_mtime(CATALOG_PATH)
+        if mtime == catalog_loaded_mtime:
+            continue
+        try:
+            reload_catalog()
+        except Exception as e:
+            catalog_loaded_mtime = mtime  # Don't retry the same broken file every interval
+            enhanced_print(f"Catalog reload failed, keeping the current catalog: {e}", level="error")
 
-    return None
+def start_catalog_watcher():
+    """Starts the catalog file watcher once, even if on_ready fires again after a reconnect."""
+    global catalog_watcher_task
 
-def extract_floor(message_content):
-    """Extracts floor number from message, ensuring it matches allowed floors."""
+    if not CATALOG_WATCH_INTERVAL or (catalog_watcher_task and not catalog_watcher_task.done()):
+        return
+    catalog_watcher_task = asyncio.create_task(catalog_watcher())
+
+def closest_boss(text):
+    """Returns the boss with the alias closest to text, for "did you mean" hints. Scans every alias, so commands only."""
+    text = text.lower().strip()
+    limit = max(2, len(text) // 2)
+    best = None
+    for alias, (priority, boss) in catalog.alias_lookup.items():
+        distance = edit_distance(text, alias, limit)
+        if distance <= limit and (best is None or (distance, priority) < best[:2]):
+            best = (distance, priority, boss)
+    return best[2] if best else None
+
+def parse_report(message_content):
+    """Extracts (floor, boss) from a message with one scan per precompiled pattern, plus a fuzzy lookup for typos."""
+    snapshot = catalog  # One catalog for the whole message, whatever a reload swaps in meanwhile
     message_lower = message_content.lower()
-    match = re.search(r"(?:f|floor)?\s*(\d{2})(?:\s*f|floor|:)?", message_lower)
 
-    if match:
-        floor_number = match.group(1)
-        if floor_number in VALID_FLOORS:
-            return floor_number
+    # Strip floor tokens and pick up the floor in the same pass
+    floor = None
+    pieces = []
+    last_end = 0
+    for match in FLOOR_PATTERN.finditer(message_lower):
+        if not pieces and match.group(1) in snapshot.valid_floors:
+            floor = match.group(1)  # Only the first floor token counts, like re.search
+        pieces.append(message_lower[last_end:match.start()])
+        last_end = match.end()
+    pieces.append(message_lower[last_end:])
+    message_cleaned = "".join(pieces)
+
+    # Several bosses in one message: the one listed first in the catalog wins
+    boss_name = None
+    best_priority = None
+    for match in snapshot.alias_pattern.finditer(message_cleaned):
+        priority, boss = snapshot.alias_lookup[match.group()]
+        if best_priority is None or priority < best_priority:
+            best_priority, boss_name = priority, boss
+            if priority == 0:
+                break
 
-    return None
+    # A floor but no known alias: most likely a typo, try the fuzzy index
+    if floor and boss_name is None:
+        boss_name = fuzzy_boss(snapshot, message_cleaned)
+        if boss_name:
+            metric_counts["fuzzy_matches"] += 1
+
+    return floor, boss_name
+
+def extract_boss_name(message_content):
+    """Extracts boss name from message using aliases."""
+    return parse_report(message_content)[1]
+
+def extract_floor(message_content):
+    """Extracts floor number from message, ensuring it matches allowed floors."""
+    return parse_report(message_content)[0]
+
+@bot.event
+async def setup_hook():
+    # ✅ Pick up where the last process left off before connecting, so on_message never sees a round the journal then replaces
+    restore_state()
 
 @bot.event
 async def on_ready():
     enhanced_print(f"Logged in as {bot.user}")
-
-    if not update_report.is_running():  # ✅ Prevent multiple loops
-        update_report.start()
-
-bot.run(TOKEN)
+    restore_spawn_stats()
+    start_startup_profiling()
+    start_outbound_dispatcher()
+    start_log_flusher()
+    await start_metrics_server()
+    start_ingest_workers()
+    start_catalog_watcher()
+
+    start_report_scheduler()  # ✅ Prevent multiple schedulers
+
+if __name__ == "__main__":
+    bot.run(TOKEN)
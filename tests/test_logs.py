@@ -0,0 +1,47 @@
+"""The Discord log pipeline must keep draining whatever lands in the queue."""
+import asyncio
+import os
+import sys
+from collections import deque
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+from _bot import load_bot  # noqa: E402
+
+bot_module = load_bot()  # Before fakes, it takes the repo root off sys.path so "discord" is the library
+
+from fakes import FakeDiscord  # noqa: E402
+
+
+@pytest.fixture
+def log_channel(monkeypatch):
+    """An empty log queue wired to an in-memory log channel."""
+    fake = FakeDiscord(now=lambda: datetime(2026, 10, 16, 18, 50, tzinfo=timezone.utc))
+    monkeypatch.setattr(bot_module, "get_channel", fake.get_channel)
+    monkeypatch.setattr(bot_module, "log_queue", deque())
+    monkeypatch.setattr(bot_module, "log_queue_chars", 0)
+    monkeypatch.setattr(bot_module, "dropped_log_lines", 0)
+    return fake.channel(bot_module.LOG_CHANNEL_ID)
+
+
+def test_a_line_longer_than_a_flush_is_truncated_and_sent(log_channel):
+    bot_module.enhanced_print("x" * (bot_module.LOG_BLOCKS_PER_FLUSH * bot_module.LOG_BLOCK_LIMIT), level="warning")
+    bot_module.enhanced_print("next line", level="warning")
+    asyncio.run(bot_module.flush_logs())
+    sent = [message.content for message in log_channel.messages.values()]
+    assert len(sent[0]) <= bot_module.LOG_BLOCK_LIMIT and sent[0].endswith("...```")
+    assert sent[1:] == ["```next line```"]
+    assert not bot_module.log_queue and bot_module.log_queue_chars == 0
+
+
+def test_overlong_lines_after_dropped_lines_still_drain(log_channel):
+    bot_module.dropped_log_lines = 5
+    for _ in range(6):
+        bot_module.enhanced_print("y" * 10000, level="warning")
+    for _ in range(3):
+        asyncio.run(bot_module.flush_logs())
+    assert not bot_module.log_queue and bot_module.log_queue_chars == 0
+    assert all(len(message.content) <= bot_module.LOG_BLOCK_LIMIT for message in log_channel.messages.values())
@@ -0,0 +1,204 @@
+"""Live ingest and a backfill rescan must agree on every floor's tally."""
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+from _bot import load_bot  # noqa: E402
+
+bot_module = load_bot()  # Before fakes, it takes the repo root off sys.path so "discord" is the library
+
+from fakes import FakeAuthor, FakeDiscord  # noqa: E402
+
+REPORTS = ["F70 frioo", "70 gucci", "70 dor", "45 dor", "45 gucci", "f45 frio", "55 magma", "55 wesil", "hi all", "70"]
+
+
+class FixedClock:
+    """Stands still at xx:50, inside the report edit window and within a backfill window of the stream."""
+
+    def __init__(self, tz):
+        self.tz = tz
+        self.current = datetime(2026, 10, 16, 18, 50, tzinfo=tz)
+
+    def now(self):
+        return self.current
+
+
+@pytest.fixture
+def world(monkeypatch):
+    """A fresh bot state with one guild, wired to in-memory channels."""
+    test_clock = FixedClock(bot_module.clock.tz)
+    monkeypatch.setattr(bot_module, "clock", test_clock)
+    monkeypatch.setattr(bot_module, "ingest_queue", None)
+    fake = FakeDiscord(now=test_clock.now)
+    monkeypatch.setattr(bot_module, "get_channel", fake.get_channel)
+    bot_module.configure_guilds({bot_module.DEFAULT_GUILD_ID: bot_module.DEFAULT_GUILD_CONFIG})
+    fake.add_bot_channels(bot_module)
+    return fake
+
+
+def guild_state():
+    return bot_module.guilds[bot_module.DEFAULT_GUILD_ID]
+
+
+def post(world, stream):
+    """Adds (voter, content) pairs to the source channels a second apart, ending a minute before now."""
+    guild = guild_state()
+    channel_ids = sorted(guild.source_channel_ids)
+    start = world.now() - timedelta(seconds=60 + len(stream))
+    return [
+        world.add_message(channel_ids[index % len(channel_ids)], FakeAuthor(voter), content, start + timedelta(seconds=index))
+        for index, (voter, content) in enumerate(stream)
+    ]
+
+
+def tallies(guild):
+    """Returns floor -> (current boss, counts) for the guild's live round."""
+    castle_round = bot_module.current_round(guild)
+    return {floor: (tally.current_boss, dict(tally.counts)) for floor, tally in zip(castle_round.floors, castle_round.tallies)}
+
+
+def live(messages):
+    guild = guild_state()
+    for message in messages:
+        asyncio.run(bot_module.apply_ingest_batch([(guild, message)]))
+    return tallies(guild)
+
+
+def rescan():
+    """Counts the source channels' messages from scratch, as a restart without a journal would."""
+    bot_module.configure_guilds({bot_module.DEFAULT_GUILD_ID: bot_module.DEFAULT_GUILD_CONFIG})
+    guild = guild_state()
+    asyncio.run(bot_module.scan_recent_messages_for_bosses(guild))
+    return tallies(guild)
+
+
+def random_stream(seed, size=60, voters=8):
+    rng = random.Random(seed)
+    return [(100 + rng.randrange(voters), rng.choice(REPORTS)) for _ in range(size)]
+
+
+def test_spam_from_one_voter_counts_once(world):
+    messages = post(world, [(1, "70 gucci")] + [(2, "F70 frioo")] * 3)
+    result = live(messages)
+    assert result["70"] == ("GUCCI", {"GUCCI": 1, "FRIOO": 1})
+    assert rescan() == result
+
+
+def test_three_voters_override_the_first_report(world):
+    messages = post(world, [(1, "70 gucci"), (2, "F70 frioo"), (3, "F70 frioo"), (4, "F70 frioo")])
+    result = live(messages)
+    assert result["70"] == ("FRIOO", {"GUCCI": 1, "FRIOO": 3})
+    assert rescan() == result
+
+
+def test_rescan_over_counted_messages_changes_nothing(world):
+    messages = post(world, random_stream(seed=7))
+    result = live(messages)
+    asyncio.run(bot_module.scan_recent_messages_for_bosses(guild_state()))
+    assert tallies(guild_state()) == result
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_live_ingest_matches_rescan(world, seed):
+    messages = post(world, random_stream(seed))
+    assert live(messages) == rescan()
+
+
+def delete(world, message):
+    del message.channel.messages[message.id]
+    asyncio.run(bot_module.retract_deleted(message.channel.id, [message.id]))
+
+
+def edit(world, message, content):
+    message.content = content
+    payload = SimpleNamespace(channel_id=message.channel.id, message_id=message.id,
+                              data={"content": content, "author": {"id": str(message.author.id)}})
+    asyncio.run(bot_module.on_raw_message_edit(payload))
+
+
+def test_deleting_an_override_vote_restores_the_first_report(world):
+    messages = post(world, [(1, "70 gucci"), (2, "70 dor"), (3, "70 dor"), (4, "70 dor")])
+    assert live(messages)["70"][0] == "DOR"
+    delete(world, messages[2])
+    result = tallies(guild_state())
+    assert result["70"] == ("GUCCI", {"GUCCI": 1, "DOR": 2})
+    assert rescan() == result
+
+
+def test_deleting_a_voters_latest_report_brings_back_their_earlier_one(world):
+    messages = post(world, [(1, "70 gucci"), (2, "70 dor"), (2, "70 frioo")])
+    live(messages)
+    delete(world, messages[2])
+    result = tallies(guild_state())
+    assert result["70"] == ("GUCCI", {"GUCCI": 1, "DOR": 1})
+    assert rescan() == result
+
+
+def test_editing_the_first_report_recounts_it_in_place(world):
+    messages = post(world, [(1, "70 gucci"), (2, "70 dor"), (3, "70 dor")])
+    live(messages)
+    edit(world, messages[0], "70 dor")
+    result = tallies(guild_state())
+    assert result["70"] == ("DOR", {"DOR": 3})
+    assert rescan() == result
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_edits_and_deletes_match_a_rescan_of_the_survivors(world, seed):
+    rng = random.Random(seed)
+    messages = post(world, random_stream(seed))
+    live(messages)
+    for message in rng.sample(messages, 15):
+        if rng.random() < 0.5:
+            delete(world, message)
+        else:
+            edit(world, message, rng.choice(REPORTS))
+    assert tallies(guild_state()) == rescan()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_rescan_of_dropped_reports_counts_them_in_posting_order(world, seed):
+    rng = random.Random(seed)
+    messages = post(world, random_stream(seed))
+    live([message for message in messages if rng.random() < 0.6])  # The rest were shed by a full ingest queue
+    asyncio.run(bot_module.scan_recent_messages_for_bosses(guild_state()))
+    assert tallies(guild_state()) == rescan()
+
+
+def test_reports_arriving_out_of_order_count_as_a_rescan_would(world, monkeypatch):
+    messages = post(world, random_stream(seed=3, size=400, voters=30))
+    for index in range(0, len(messages) - 1, 2):
+        messages[index], messages[index + 1] = messages[index + 1], messages[index]  # Two channels delivering out of step
+    recounts = []
+    rebuild = bot_module.FloorTally.rebuild
+    monkeypatch.setattr(bot_module.FloorTally, "rebuild", lambda tally: recounts.append(tally) or rebuild(tally))
+    result = live(messages)
+    assert len(recounts) < len(messages) // 20  # Late reports are counted in place, not by recounting the floor
+    assert rescan() == result
+
+
+def test_concurrent_monarch_reports_ping_once(world, monkeypatch):
+    guild = guild_state()
+    target = world.channel(guild.target_channel_id)
+    send = type(target).send
+
+    async def slow_send(channel, content):
+        await asyncio.sleep(0)  # Lets the other worker run while this send is in flight
+        return await send(channel, content)
+
+    monkeypatch.setattr(type(target), "send", slow_send)
+    first, second = post(world, [(1, "F70 monarch"), (2, "70 sjw")])
+
+    async def two_workers():
+        await asyncio.gather(bot_module.apply_ingest_batch([(guild, first), (guild, second)]),
+                             bot_module.apply_ingest_batch([(guild, second)]))
+
+    asyncio.run(two_workers())
+    assert sum("MONARCH SPOTTED" in (content or "") for *_, content in world.outbound) == 1
@@ -0,0 +1,22 @@
+"""Loads the bot script as an importable module for the offline tools."""
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, "discord.py")
+
+
+def load_bot(module_name="castle_bot"):
+    """Imports discord.py under another name so it doesn't shadow the discord library."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    # The repo root holds a file called discord.py, keep it off the path
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.getcwd()) != ROOT]
+
+    spec = importlib.util.spec_from_file_location(module_name, BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
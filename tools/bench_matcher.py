@@ -0,0 +1,201 @@
+"""Micro-benchmark for the boss/floor parser.
+
+Compares the old per-alias regex scan with the precompiled matcher on a
+corpus of chat lines and checks both return the same (floor, boss). Then
+feeds misspelt reports and floor-only chatter through the fuzzy lookup to
+show its hit rate, false matches and cold-cache cost.
+
+Usage: python tools/bench_matcher.py [--lines 20000] [--repeat 5]
+"""
+import argparse
+import random
+import re
+import time
+
+from _bot import load_bot
+
+CHATTER = [
+    "anyone got the castle yet?",
+    "lol",
+    "gg",
+    "which floor is the good one",
+    "omw",
+    "ty!!",
+    "can someone carry me pls",
+    "where is everyone",
+    "spawned?",
+    "brb 5 min",
+    "server 3 is lagging hard",
+    "does anyone know the drop rate",
+    "ok who took my kill",
+    "nice one",
+    "chain",
+]
+
+REPORT_TEMPLATES = [
+    "F{floor} {alias}",
+    "f{floor} {alias}",
+    "{floor} {alias}",
+    "floor {floor} {alias}",
+    "Floor{floor}: {alias}",
+    "{alias} {floor}",
+    "{alias} f{floor}",
+    "{alias} on {floor}!!",
+    "{floor}f {alias} confirmed",
+    "{ALIAS} F{floor}",
+    "pretty sure {floor} is {alias}",
+    "{floor}: {alias} ??",
+]
+
+
+def build_corpus(bot_module, size, seed=1234):
+    """Generates real-looking chat lines, roughly 40% of them boss reports."""
+    rng = random.Random(seed)
+    aliases = [alias for group in bot_module.catalog.boss_aliases.values() for alias in group]
+    floors = sorted(bot_module.catalog.valid_floors) + ["20", "75", "99"]
+
+    corpus = []
+    for _ in range(size):
+        if rng.random() < 0.4:
+            alias = rng.choice(aliases)
+            template = rng.choice(REPORT_TEMPLATES)
+            corpus.append(template.format(floor=rng.choice(floors), alias=alias, ALIAS=alias.upper()))
+        else:
+            corpus.append(rng.choice(CHATTER))
+    return corpus
+
+
+def legacy_parser(bot_module):
+    """The per-message alias scan the bot used before the precompiled matcher, with today's floor token."""
+    floor_token = bot_module.FLOOR_PATTERN.pattern
+    boss_aliases = bot_module.catalog.boss_aliases
+    valid_floors = bot_module.catalog.valid_floors
+
+    def extract_boss_name(message_content):
+        message_lower = message_content.lower()
+        message_cleaned = re.sub(floor_token, "", message_lower).strip()
+
+        for boss, aliases in boss_aliases.items():
+            for alias in aliases:
+                if re.search(rf"\b{alias}\b", message_cleaned):
+                    return boss.upper()
+
+        return None
+
+    def extract_floor(message_content):
+        message_lower = message_content.lower()
+        match = re.search(floor_token, message_lower)
+
+        if match:
+            floor_number = match.group(1)
+            if floor_number in valid_floors:
+                return floor_number
+
+        return None
+
+    def parse(message_content):
+        return extract_floor(message_content), extract_boss_name(message_content)
+
+    return parse
+
+
+def misspell(rng, word):
+    """Applies one random typo: a dropped, doubled, swapped or replaced letter."""
+    index = rng.randrange(len(word) - 1)
+    kind = rng.choice(("drop", "double", "swap", "replace"))
+    if kind == "drop":
+        return word[:index] + word[index + 1:]
+    if kind == "double":
+        return word[:index] + word[index] + word[index:]
+    if kind == "swap":
+        return word[:index] + word[index + 1] + word[index] + word[index + 2:]
+    return word[:index] + rng.choice("aeioulnrst") + word[index + 1:]
+
+
+def typo_corpus(bot_module, size, seed=1234):
+    """Returns (line, expected boss) for misspelt reports and (line, None) for chatter that names a floor."""
+    rng = random.Random(seed)
+    alias_lookup = bot_module.catalog.alias_lookup
+    aliases = [alias for alias in alias_lookup if len(alias) >= bot_module.FUZZY_MIN_LENGTH]
+    floors = sorted(bot_module.catalog.valid_floors)
+
+    corpus = []
+    for _ in range(size):
+        floor = rng.choice(floors)
+        if rng.random() < 0.5:
+            alias = rng.choice(aliases)
+            typo = misspell(rng, alias)
+            if typo in alias_lookup:
+                continue  # The typo happens to be another alias
+            corpus.append((f"F{floor} {typo}", alias_lookup[alias][1]))
+        else:
+            corpus.append((f"F{floor} {rng.choice(CHATTER)}", None))
+    return corpus
+
+
+def measure_fuzzy(bot_module, corpus):
+    """Returns (right, wrong, missed, false matches, microseconds per line) with a cold fuzzy cache."""
+    right = wrong = missed = false_matches = 0
+    elapsed = 0.0
+    for line, expected in corpus:
+        bot_module.catalog.fuzzy_token.cache_clear()
+        start = time.perf_counter()
+        boss = bot_module.parse_report(line)[1]
+        elapsed += time.perf_counter() - start
+        if expected is None:
+            false_matches += boss is not None
+        elif boss == expected:
+            right += 1
+        elif boss is None:
+            missed += 1
+        else:
+            wrong += 1
+    return right, wrong, missed, false_matches, elapsed / len(corpus) * 1e6
+
+
+def measure(parse, corpus, repeat):
+    """Returns the best messages/sec over `repeat` passes."""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in corpus:
+            parse(line)
+        elapsed = time.perf_counter() - start
+        best = max(best, len(corpus) / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20000, help="corpus size")
+    parser.add_argument("--repeat", type=int, default=5, help="passes per parser, best one is kept")
+    args = parser.parse_args()
+
+    bot_module = load_bot()
+    corpus = build_corpus(bot_module, args.lines)
+    before = legacy_parser(bot_module)
+    after = bot_module.parse_report
+
+    mismatches = [line for line in corpus if before(line) != after(line)]
+    if mismatches:
+        for line in mismatches[:10]:
+            print(f"MISMATCH {line!r}: before={before(line)} after={after(line)}")
+        raise SystemExit(f"{len(mismatches)} of {len(corpus)} lines parse differently")
+
+    before_rate = measure(before, corpus, args.repeat)
+    after_rate = measure(after, corpus, args.repeat)
+    print(f"corpus: {len(corpus)} lines, results identical")
+    print(f"before: {before_rate:>12,.0f} msgs/sec")
+    print(f"after:  {after_rate:>12,.0f} msgs/sec  ({after_rate / before_rate:.1f}x)")
+
+    typos = typo_corpus(bot_module, args.lines // 10)
+    right, wrong, missed, false_matches, micros = measure_fuzzy(bot_module, typos)
+    misspelt = right + wrong + missed
+    print(f"typos:  {right / misspelt:.1%} right, {wrong / misspelt:.1%} wrong boss, {missed / misspelt:.1%} unmatched "
+          f"of {misspelt} misspelt reports")
+    print(f"chatter with a floor: {false_matches} of {len(typos) - misspelt} matched a boss")
+    print(f"fuzzy lookup: {micros:.0f} us per line with a cold cache")
+
+
+if __name__ == "__main__":
+    main()
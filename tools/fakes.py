@@ -0,0 +1,172 @@
+"""In-memory stand-ins for the Discord channels and messages the bot talks to.
+
+Every outbound call (send, edit, fetch, history page) is counted against the
+handler that made it, so the offline tools can report API cost per handler.
+"""
+import contextvars
+import itertools
+from collections import Counter, OrderedDict, defaultdict
+from types import SimpleNamespace
+
+import discord
+
+# Name of the handler currently running, outbound calls are booked against it
+current_handler = contextvars.ContextVar("current_handler", default="other")
+
+HISTORY_PAGE_SIZE = 100  # Messages per history request, like the real API
+
+
+class FakeAuthor:
+    def __init__(self, author_id, bot=False):
+        self.id = author_id
+        self.bot = bot
+        self.name = f"user{author_id}"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeMessage:
+    def __init__(self, world, channel, message_id, author, content, created_at):
+        self.world = world
+        self.channel = channel
+        self.id = message_id
+        self.author = author
+        self.content = content
+        self.created_at = created_at
+        self.guild = None
+
+    async def edit(self, content=None):
+        return await self.channel.edit_message(self.id, content)
+
+
+class FakePartialMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+
+    @property
+    def created_at(self):
+        return discord.utils.snowflake_time(self.id)
+
+    async def edit(self, content=None):
+        return await self.channel.edit_message(self.id, content)
+
+
+class FakeChannel:
+    def __init__(self, world, channel_id):
+        self.world = world
+        self.id = channel_id
+        self.guild = None
+        self.messages = OrderedDict()  # Message ID -> FakeMessage, oldest first
+
+    async def send(self, content):
+        self.world.record("send", self, content)
+        message = self.world.add_message(self.id, self.world.bot_user, content)
+        return message
+
+    async def edit_message(self, message_id, content):
+        self.world.record("edit", self, content)
+        message = self.messages.get(message_id)
+        if message is None:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+        message.content = content
+        return message
+
+    async def fetch_message(self, message_id):
+        self.world.record("fetch", self)
+        message = self.messages.get(message_id)
+        if message is None:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+        return message
+
+    def get_partial_message(self, message_id):
+        return FakePartialMessage(self, message_id)
+
+    async def history(self, limit=100, after=None):
+        """Yields messages oldest first after `after`, booking one request per page."""
+        if isinstance(after, discord.Object):
+            after_id = after.id
+        elif after is not None:
+            after_id = discord.utils.time_snowflake(after, high=True)
+        else:
+            after_id = 0
+
+        matching = [message for message in self.messages.values() if message.id > after_id]
+        if limit is not None:
+            matching = matching[:limit]
+
+        self.world.record("history", self)
+        for index, message in enumerate(matching, start=1):
+            yield message
+            if index % HISTORY_PAGE_SIZE == 0 and index < len(matching):
+                self.world.record("history", self)
+
+
+class FakeContext:
+    """Just enough of commands.Context for the bot's command callbacks."""
+
+    def __init__(self, message):
+        self.message = message
+        self.author = message.author
+        self.channel = message.channel
+        self.guild = message.guild
+
+
+class FakeDiscord:
+    """A set of in-memory channels plus a ledger of the outbound calls made against them."""
+
+    def __init__(self, now, bot_user_id=1):
+        self.now = now  # Callable returning the current aware UTC time
+        self.channels = {}
+        self.bot_user = FakeAuthor(bot_user_id, bot=True)
+        self.calls = defaultdict(Counter)  # Handler -> call kind -> count
+        self.outbound = []  # (time, handler, kind, channel ID, content) in call order
+        self._sequence = itertools.count()
+
+    def channel(self, channel_id):
+        """Returns the channel with this ID, creating it on first use."""
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(self, channel_id)
+        return self.channels[channel_id]
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def add_bot_channels(self, bot_module):
+        """Creates every channel the bot's guild configs and log pipeline refer to."""
+        for guild in bot_module.guilds.values():
+            for channel_id in (*guild.source_channel_ids, guild.target_channel_id, guild.command_response_channel_id):
+                self.channel(channel_id)
+        self.channel(bot_module.LOG_CHANNEL_ID)
+
+    def add_message(self, channel_id, author, content, created_at=None):
+        """Stores a message in a channel and returns it, no API call is booked."""
+        created_at = created_at or self.now()
+        # Real snowflakes are time ordered, keep the low bits unique
+        message_id = discord.utils.time_snowflake(created_at) + next(self._sequence) % 4096
+        channel = self.channel(channel_id)
+        message = FakeMessage(self, channel, message_id, author, content, created_at)
+        channel.messages[message_id] = message
+        return message
+
+    def record(self, kind, channel, content=None):
+        handler = current_handler.get()
+        self.calls[handler][kind] += 1
+        self.outbound.append((self.now(), handler, kind, channel.id, content))
+
+    async def process_commands(self, bot, message):
+        """Runs a "!name args" message through the matching command callback."""
+        if message.author.bot or not message.content.startswith(bot.command_prefix):
+            return
+
+        name, _, rest = message.content[len(bot.command_prefix):].partition(" ")
+        command = bot.all_commands.get(name)
+        if command is None:
+            return
+
+        kwargs = {}
+        params = list(command.clean_params.values())
+        if params and rest.strip():
+            kwargs[params[0].name] = rest.strip()
+        await command.callback(FakeContext(message), **kwargs)
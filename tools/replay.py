@@ -0,0 +1,241 @@
+"""Offline replay harness and throughput benchmark.
+
+Feeds a JSONL corpus of chat messages through the library's gateway
+parser and caches, then through on_message (commands included) and the
+ingest workers behind it, then exercises the report path, all against
+in-memory channels from fakes.py. Prints messages/sec, latency per
+handler, the Discord API calls each handler would have made and peak RSS.
+Run it with LOW_MEMORY=0 and LOW_MEMORY=1 to compare the gateway settings.
+
+Corpus lines look like
+    {"channel_id": 1370376699442630749, "author_id": 42, "content": "F70 frioo", "offset": 12.5}
+where offset is seconds since the first message.
+
+Usage:
+    python tools/replay.py [corpus.jsonl] [--messages 20000] [--burst 100] [--min-rate 10000] [--profile DIR]
+    python tools/replay.py --generate 20000 > corpus.jsonl
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import resource
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import discord
+
+from _bot import load_bot
+from bench_matcher import build_corpus
+from fakes import FakeAuthor, FakeDiscord, current_handler
+
+COMMANDS = ["!edit F70 Frioo", "!edit F45 gucci", "!test", "!force_update", "!edit 55 dor"]
+COMMAND_RATE = 0.002  # Share of generated messages that are commands
+
+
+def generate_corpus(bot_module, size, seed=1234):
+    """Builds a synthetic corpus for the first configured guild, spread over the 12-minute report window."""
+    rng = random.Random(seed)
+    channel_ids = sorted(next(iter(bot_module.guilds.values())).source_channel_ids)
+    lines = build_corpus(bot_module, size, seed)
+    span = 11 * 60
+
+    corpus = []
+    for index, content in enumerate(lines):
+        if rng.random() < COMMAND_RATE:
+            content = rng.choice(COMMANDS)
+        corpus.append({
+            "channel_id": rng.choice(channel_ids),
+            "author_id": 1000 + rng.randrange(300),
+            "content": content,
+            "offset": round(span * index / max(size, 1), 3),
+        })
+    return corpus
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as corpus_file:
+        return [json.loads(line) for line in corpus_file if line.strip()]
+
+
+def guild_create_payload(guild, channel_ids):
+    """A GUILD_CREATE event for a configured guild, without members like the gateway sends it to a bot without that intent."""
+    return {
+        "id": str(guild.guild_id), "name": guild.name, "unavailable": False, "member_count": 0,
+        "roles": [], "emojis": [], "stickers": [], "members": [], "voice_states": [], "threads": [],
+        "channels": [
+            {"id": str(channel_id), "type": 0, "name": f"channel-{channel_id}", "position": 0, "permission_overwrites": []}
+            for channel_id in sorted(channel_ids)
+        ],
+    }
+
+
+def message_create_payload(message, guild_id):
+    """The MESSAGE_CREATE event a FakeMessage would have arrived as."""
+    author_id = str(message.author.id)
+    return {
+        "id": str(message.id), "channel_id": str(message.channel.id), "guild_id": guild_id, "type": 0,
+        "author": {"id": author_id, "username": message.author.name, "discriminator": "0", "avatar": None},
+        "member": {"roles": [], "joined_at": message.created_at.isoformat(), "deaf": False, "mute": False},
+        "content": message.content, "timestamp": message.created_at.isoformat(), "edited_timestamp": None,
+        "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+        "embeds": [], "pinned": False,
+    }
+
+
+def handler_name(content):
+    if content.startswith("!"):
+        return content.split(None, 1)[0]
+    return "on_message"
+
+
+class Timings:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextlib.contextmanager
+    def measure(self, handler):
+        token = current_handler.set(handler)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[handler].append(time.perf_counter() - start)
+            current_handler.reset(token)
+
+
+async def replay(bot_module, corpus, timings, burst, profile=False):
+    """Runs the corpus and the report path, returns (world, messages/sec until the ingest queue drained, profile path)."""
+    if profile:
+        bot_module.start_profiling()
+    start = discord.utils.utcnow() - timedelta(seconds=corpus[-1]["offset"] if corpus else 0)
+    world = FakeDiscord(now=discord.utils.utcnow)
+    world.add_bot_channels(bot_module)
+
+    bot_module.get_channel = world.get_channel
+    bot_module.bot.process_commands = lambda message: world.process_commands(bot_module.bot, message)
+
+    authors = {}
+    messages = []
+    for record in corpus:
+        author = authors.setdefault(record["author_id"], FakeAuthor(record["author_id"]))
+        created_at = start + timedelta(seconds=record["offset"])
+        messages.append(world.add_message(record["channel_id"], author, record["content"], created_at))
+
+    # Gateway: every message goes through the library's parser and caches first, as a live MESSAGE_CREATE would
+    state = bot_module.bot._connection
+    state.dispatch = lambda *args, **kwargs: None  # on_message is driven below, against the in-memory channels
+    for guild in bot_module.guilds.values():
+        state.parse_guild_create(guild_create_payload(guild, {*guild.source_channel_ids, guild.target_channel_id}))
+    for message in messages:
+        guild = bot_module.channel_guilds.get(message.channel.id)
+        payload = message_create_payload(message, str(guild.guild_id) if guild else None)
+        with timings.measure("gateway_parse"):
+            state.parse_message_create(payload)
+
+    # The fake channels have no rate limits, keep the scheduler's buckets out of the timings
+    bot_module.OUTBOUND_BUCKET_SIZE = bot_module.OUTBOUND_GLOBAL_LIMIT = 10**9
+    bot_module.start_outbound_dispatcher()
+    token = current_handler.set("ingest_worker")
+    bot_module.start_ingest_workers()
+    current_handler.reset(token)
+
+    # Live ingest, the gateway hands over `burst` events before the workers get a turn
+    ingest_start = time.perf_counter()
+    for index, message in enumerate(messages, start=1):
+        with timings.measure(handler_name(message.content)):
+            await bot_module.on_message(message)
+        if index % burst == 0:
+            await asyncio.sleep(0)
+    await bot_module.ingest_queue.join()
+    ingest_elapsed = time.perf_counter() - ingest_start
+
+    # Report path: backfill, render, post and edit this hour's report
+    guild = next(iter(bot_module.guilds.values()))
+    with timings.measure("scan_recent_messages_for_bosses"):
+        await bot_module.scan_recent_messages_for_bosses(guild)
+    for _ in range(100):
+        with timings.measure("build_report_content"):
+            await bot_module.build_report_content(guild)
+
+    target = world.channel(guild.target_channel_id)
+    with timings.measure("report_send"):
+        report = await target.send(await bot_module.build_report_content(guild))
+    bot_module.register_report(guild, target, report.id, bot_module.clock.now())
+    for _ in range(10):
+        bot_module.mark_report_dirty(guild)
+        with timings.measure("edit_current_report"):
+            await bot_module.edit_current_report(guild)
+
+    with timings.measure("flush_logs"):
+        await bot_module.flush_logs()
+
+    for task in (*bot_module.ingest_worker_tasks, bot_module.outbound_dispatcher_task):
+        task.cancel()
+    profile_path = bot_module.stop_profiling() if profile else None
+    return world, len(messages) / ingest_elapsed if ingest_elapsed else 0.0, profile_path
+
+
+def print_results(bot_module, rate, timings, world, corpus_size):
+    counts = bot_module.metric_counts
+    cached = bot_module.bot._connection._messages
+    print(f"replayed {corpus_size} messages: {rate:,.0f} msgs/sec through on_message and the ingest workers")
+    print(f"ingest: {counts['messages_parsed']} parsed in {counts['ingest_batches']} batches, "
+          f"{counts['ingest_dropped']} dropped")
+    print(f"memory: peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB, "
+          f"{'low-memory' if bot_module.LOW_MEMORY else 'library default'} gateway settings, "
+          f"{len(cached) if cached is not None else 'no'} messages in the library cache")
+    print()
+    print(f"{'handler':<34}{'calls':>8}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for handler, samples in sorted(timings.samples.items()):
+        ordered = sorted(samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        print(f"{handler:<34}{len(samples):>8}{statistics.fmean(samples) * 1e3:>10.3f}"
+              f"{statistics.median(samples) * 1e3:>10.3f}{p99 * 1e3:>10.3f}{ordered[-1] * 1e3:>10.3f}")
+    print()
+    print(f"{'handler':<34}{'outbound API calls':<}")
+    for handler, calls in sorted(world.calls.items()):
+        per_call = sum(calls.values()) / max(len(timings.samples.get(handler, ())), 1)
+        detail = ", ".join(f"{kind}={count}" for kind, count in sorted(calls.items()))
+        print(f"{handler:<34}{detail}  ({per_call:.2f} per call)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", help="JSONL corpus, a synthetic one is generated if omitted")
+    parser.add_argument("--messages", type=int, default=20000, help="size of the synthetic corpus")
+    parser.add_argument("--generate", type=int, metavar="N", help="print a synthetic corpus of N messages and exit")
+    parser.add_argument("--burst", type=int, default=100, help="messages delivered before the event loop gets a turn")
+    parser.add_argument("--min-rate", type=float, default=0, help="exit non-zero below this many msgs/sec")
+    parser.add_argument("--profile", metavar="DIR", help="profile the replay and write the bot's summary file to DIR")
+    args = parser.parse_args()
+
+    bot_module = load_bot()
+    if args.generate:
+        for record in generate_corpus(bot_module, args.generate):
+            print(json.dumps(record))
+        return
+
+    corpus = load_corpus(args.corpus) if args.corpus else generate_corpus(bot_module, args.messages)
+    timings = Timings()
+
+    # The bot prints every log line, keep that out of the report
+    if args.profile:
+        bot_module.PROFILE_OUTPUT_DIR = args.profile
+    with contextlib.redirect_stdout(io.StringIO()):
+        world, rate, profile_path = asyncio.run(replay(bot_module, corpus, timings, args.burst, bool(args.profile)))
+
+    print_results(bot_module, rate, timings, world, len(corpus))
+    if profile_path:
+        print(f"\nprofile summary: {profile_path}")
+    if rate < args.min_rate:
+        sys.exit(f"throughput {rate:,.0f} msgs/sec is below --min-rate {args.min_rate:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
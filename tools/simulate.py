@@ -0,0 +1,259 @@
+"""Virtual-clock simulation of the hourly report cycle.
+
+Runs the real report scheduler against in-memory channels on a virtual
+clock, with synthetic boss reports arriving during every castle window,
+and fast-forwards through days of hourly cycles in seconds. Every post
+and edit the bot would make is recorded and summarised per cycle.
+
+Usage:
+    python tools/simulate.py [--days 3] [--start 2026-03-28T00:00] [--wake-jitter 90] [--guilds 40] [--trace]
+"""
+import argparse
+import asyncio
+import contextlib
+import heapq
+import io
+import itertools
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from _bot import load_bot
+from fakes import FakeAuthor, FakeDiscord, current_handler
+
+SETTLE_ROUNDS = 20  # Event loop turns given to woken tasks before time moves on
+
+
+class VirtualClock:
+    """Drop-in for the bot's SystemClock where time only moves when run_until() advances it."""
+
+    def __init__(self, start, wake_jitter=0.0, seed=0):
+        self.current = start
+        self.tz = start.tzinfo
+        self.wake_jitter = wake_jitter  # Max seconds a sleeper wakes late, to exercise late wake-ups
+        self.rng = random.Random(seed)
+        self.timers = []  # (deadline timestamp, sequence, future)
+        self._sequence = itertools.count()
+
+    def now(self):
+        return self.current
+
+    async def sleep_until(self, moment):
+        deadline = moment.timestamp()
+        if self.wake_jitter:
+            deadline += self.rng.uniform(0, self.wake_jitter)
+        if deadline <= self.current.timestamp():
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.timers, (deadline, next(self._sequence), future))
+        await future
+
+    async def sleep(self, seconds):
+        await self.sleep_until(self.current + timedelta(seconds=seconds))
+
+    async def wait(self, event, timeout):
+        if event.is_set():
+            return True
+        waiter = asyncio.ensure_future(event.wait())
+        timer = asyncio.ensure_future(self.sleep(timeout))
+        done, pending = await asyncio.wait({waiter, timer}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        return waiter in done
+
+    async def settle(self):
+        for _ in range(SETTLE_ROUNDS):
+            await asyncio.sleep(0)
+
+    async def run_until(self, end):
+        """Wakes sleepers in deadline order until virtual time reaches end."""
+        end_timestamp = end.timestamp()
+        while True:
+            await self.settle()
+            while self.timers and self.timers[0][2].done():
+                heapq.heappop(self.timers)  # Cancelled sleeper
+            if not self.timers or self.timers[0][0] > end_timestamp:
+                self.current = end
+                return
+
+            deadline, _, future = heapq.heappop(self.timers)
+            if deadline > self.current.timestamp():
+                self.current = datetime.fromtimestamp(deadline, self.tz)
+            future.set_result(None)
+
+
+def synthetic_guilds(bot_module, count):
+    """Returns guild ID -> config for count made-up guilds, each with its own channels."""
+    configs = {}
+    for index in range(count):
+        base = 10**15 + index * 10
+        configs[9000 + index] = {
+            "name": f"guild{index}",
+            "source_channel_ids": [base, base + 1],
+            "target_channel_id": base + 2,
+            "command_response_channel_id": base,
+            "ping_role_id": base + 3,
+            "sjw_role_id": base + 4,
+        }
+    return configs
+
+
+async def castle_chatter(bot_module, world, clock, guild, end, rng, reports_per_hour):
+    """Sends synthetic boss reports into a guild's source channels during every xx:44-55 window."""
+    floors = bot_module.catalog.floor_order
+    boss_aliases = bot_module.catalog.boss_aliases
+    bosses = list(boss_aliases)
+    channel_ids = sorted(guild.source_channel_ids)
+    authors = [FakeAuthor(1000 + index) for index in range(200)]
+
+    post_at, window_end = bot_module.report_window(clock.now())
+    while post_at.timestamp() < end.timestamp():
+        truth = {floor: rng.choice(bosses) for floor in floors}
+        arrivals = sorted(rng.uniform(30, 11 * 60) for _ in range(reports_per_hour))
+        for offset in arrivals:
+            await clock.sleep_until(post_at + timedelta(seconds=offset))
+            floor = rng.choice(floors)
+            boss = truth[floor] if rng.random() < 0.85 else rng.choice(bosses)
+            alias = rng.choice(boss_aliases[boss])
+            message = world.add_message(rng.choice(channel_ids), rng.choice(authors), f"F{floor} {alias}")
+            token = current_handler.set("on_message")
+            try:
+                await bot_module.on_message(message)
+            finally:
+                current_handler.reset(token)
+        post_at, window_end = bot_module.report_window(window_end)
+
+
+async def simulate(bot_module, start, end, wake_jitter, reports_per_hour, seed):
+    clock = VirtualClock(start, wake_jitter=wake_jitter, seed=seed)
+    bot_module.clock = clock
+    world = FakeDiscord(now=lambda: clock.now().astimezone(timezone.utc))
+    world.add_bot_channels(bot_module)
+    bot_module.get_channel = world.get_channel
+    bot_module.bot.process_commands = lambda message: world.process_commands(bot_module.bot, message)
+
+    bot_module.start_outbound_dispatcher()
+    token = current_handler.set("report_scheduler")
+    bot_module.start_report_scheduler()
+    current_handler.reset(token)
+    token = current_handler.set("ingest_worker")
+    bot_module.start_ingest_workers()
+    current_handler.reset(token)
+    chatter = [
+        asyncio.create_task(castle_chatter(bot_module, world, clock, guild, end, random.Random(seed + index), reports_per_hour))
+        for index, guild in enumerate(bot_module.guilds.values())
+    ]
+
+    await clock.run_until(end)
+
+    for task in (*chatter, *bot_module.report_scheduler_tasks.values(), *bot_module.ingest_worker_tasks,
+                 bot_module.outbound_dispatcher_task):
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    return world
+
+
+def summarise(bot_module, world, start, end, trace):
+    targets = {guild.target_channel_id for guild in bot_module.guilds.values()}
+    cycles = defaultdict(Counter)  # Hour key -> call kind -> count
+    post_times = defaultdict(lambda: defaultdict(list))  # Hour key -> target channel -> report post times
+    for moment, handler, kind, channel_id, content in world.outbound:
+        local = moment.astimezone(start.tzinfo)
+        hour = bot_module.report_hour_key(local)
+        cycles[hour][f"{handler}:{kind}"] += 1
+        if handler == "report_scheduler" and kind == "send" and channel_id in targets:
+            post_times[hour][channel_id].append(moment)
+        if trace and channel_id in targets:
+            print(f"{local:%Y-%m-%d %H:%M:%S} {handler:<18} {kind:<8} {channel_id}")
+
+    # Step in UTC so DST changes neither skip nor repeat an hour
+    hours = []
+    moment = start.astimezone(timezone.utc)
+    while moment < end:
+        hours.append(bot_module.report_hour_key(moment.astimezone(start.tzinfo)))
+        moment += timedelta(hours=1)
+
+    # Report posts per guild and cycle, every guild should post exactly once an hour
+    posts = [len(post_times[hour].get(channel_id, ())) for hour in hours for channel_id in targets]
+    spreads = [
+        (max(times) - min(times)).total_seconds()
+        for times in ([min(moments) for moments in post_times[hour].values()] for hour in hours) if times
+    ]
+    edits = [cycles[hour]["report_scheduler:edit"] for hour in hours]
+    totals = [sum(cycles[hour].values()) for hour in hours]
+    print(f"simulated {len(hours)} hourly cycles for {len(targets)} guild(s) from {start:%Y-%m-%d %H:%M %Z}")
+    print(f"report posts per guild and cycle: min {min(posts)}, max {max(posts)}")
+    print(f"first to last guild post per cycle: max {max(spreads):.1f}s")
+    print(f"report edits per cycle: mean {statistics.fmean(edits):.1f}, max {max(edits)}")
+    print(f"API calls per cycle:    mean {statistics.fmean(totals):.1f}, max {max(totals)}")
+    latency = bot_module.propagation_latency
+    print(f"message to report edit: p50 <= {latency.quantile(0.5)}s, p99 <= {latency.quantile(0.99)}s "
+          f"over {latency.count} changes")
+
+    by_kind = Counter()
+    for counts in cycles.values():
+        by_kind.update(counts)
+    for key, count in sorted(by_kind.items()):
+        print(f"  {key:<28}{count / len(hours):>8.2f} per cycle")
+
+    missed = [hour for hour in hours if any(len(post_times[hour].get(channel_id, ())) != 1 for channel_id in targets)]
+    ok = not missed
+    if missed:
+        missed = ", ".join(f"{hour.astimezone(start.tzinfo):%m-%d %H:00 %Z}" for hour in missed)
+        print(f"cycles where a guild didn't post exactly once: {missed}")
+    return ok
+
+
+def summarise_archive(bot_module, hours):
+    """Checks the spawn store got one round per guild and hour, returns True if it did."""
+    rounds = [bot_module.spawn_rounds[guild_id] for guild_id in bot_module.guilds]
+    with open(bot_module.SPAWN_STORE_PATH, encoding="utf-8") as store:
+        rows = sum(1 for _ in store) - 1
+    print(f"archived rounds per guild: min {min(rounds)}, max {max(rounds)} ({rows} store rows)")
+    return min(rounds) >= hours - 1 and max(rounds) <= hours  # The last cycle may end before its window closes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=3, help="simulated time span")
+    parser.add_argument("--start", help="local start time in the report time zone, ISO format (default: today 00:00)")
+    parser.add_argument("--wake-jitter", type=float, default=0, help="max seconds every sleeper wakes late")
+    parser.add_argument("--reports", type=int, default=40, help="boss reports per castle window")
+    parser.add_argument("--guilds", type=int, default=0, help="serve this many synthetic guilds instead of the configured ones")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--trace", action="store_true", help="print every post and edit")
+    args = parser.parse_args()
+
+    bot_module = load_bot()
+    if args.guilds:
+        bot_module.configure_guilds(synthetic_guilds(bot_module, args.guilds))
+    tz = bot_module.clock.tz
+    if args.start:
+        start = datetime.fromisoformat(args.start).replace(tzinfo=tz)
+    else:
+        start = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=args.days)
+
+    # Finished rounds are archived to disk, keep them out of the working directory
+    archive = tempfile.TemporaryDirectory()
+    bot_module.SPAWN_STORE_PATH = f"{archive.name}/spawns.csv"
+    bot_module.SPAWN_STATS_PATH = f"{archive.name}/spawn_stats.json"
+
+    wall_start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        world = asyncio.run(simulate(bot_module, start, end, args.wake_jitter, args.reports, args.seed))
+    elapsed = time.perf_counter() - wall_start
+
+    ok = summarise(bot_module, world, start, end, args.trace)
+    ok = summarise_archive(bot_module, round(args.days * 24)) and ok
+    print(f"wall time: {elapsed:.2f}s")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()